@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Request, Response, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import uuid
+import asyncio
+import hashlib
 import shutil
 import logging
 
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 from ...core.db import get_db
 from ...core.config import settings
+from ...core.model_manager import model_manager
 from ...schemas.document import (
     DocumentResponse, DocumentWithContent, DocumentListResponse,
     DocumentStatsResponse, SummarizeRequest, SummarizeResponse,
-    QuestionRequest, QuestionResponse, OCRRequest, OCRResponse,
+    QuestionRequest, QuestionResponse, OCRRequest, OCRResponse, OCRQuestionResponse,
     DocumentUploadResponse, ProcessingStatus, SummaryType
 )
 from ...crud.document import document_crud, summary_crud, qa_crud
@@ -108,22 +116,34 @@ async def upload_document(
 
 @router.get("/", response_model=DocumentListResponse)
 def get_documents(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     status: Optional[ProcessingStatus] = None,
     db: Session = Depends(get_db)
 ):
-    """Получение списка документов"""
+    """
+    Получение списка документов
+    
+    Ответ помечается ETag по содержимому: клиент, опрашивающий список,
+    получает 304 без тела, пока документы не изменились
+    """
     try:
         documents = document_crud.get_documents(db, skip=skip, limit=limit, status=status)
         total = document_crud.get_documents_count(db, status=status)
         
-        return DocumentListResponse(
+        body = DocumentListResponse(
             documents=documents,
             total=total,
             page=skip // limit + 1,
             per_page=limit
-        )
+        ).model_dump_json()
+        etag = f'"{hashlib.blake2b(body.encode(), digest_size=16).hexdigest()}"'
+        
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
     except Exception as e:
         logger.error(f"Error getting documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -203,8 +223,9 @@ async def summarize_document(
         if not document.extracted_text:
             raise HTTPException(status_code=400, detail="Document has no extracted text")
         
-        # Создаем конспект
-        summary_result = document_summarizer.summarize_document(
+        # Создаем конспект (в потоке инференса, не блокируя event loop)
+        summary_result = await model_manager.run_inference(
+            document_summarizer.summarize_document,
             document_text=document.extracted_text,
             summary_type=request.summary_type
         )
@@ -272,10 +293,15 @@ async def ask_question(
             )
             qa_session = qa_crud.create_session(db, session_create)
         
-        # Получаем ответ
-        answer_result = qa_service.answer_question(
+        # Версия документов из базы: общая для всех воркеров, инвалидирует кэш ответов
+        documents_version = document_crud.get_documents_version(db, request.document_ids)
+        
+        # Получаем ответ (в потоке инференса, не блокируя event loop)
+        answer_result = await model_manager.run_inference(
+            qa_service.answer_question,
             question=request.question,
-            document_ids=request.document_ids
+            document_ids=request.document_ids,
+            documents_version=documents_version
         )
         
         # Сохраняем пару вопрос-ответ
@@ -309,24 +335,55 @@ async def ask_question(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _run_ocr(image_data) -> OCRResponse:
+    """
+    Валидация и распознавание изображения (байты или base64 строка)
+    
+    Tesseract работает синхронно и долго, поэтому эндпоинты вызывают функцию
+    через asyncio.to_thread, не блокируя event loop
+    """
+    # Валидация изображения
+    is_valid, error_msg = ocr_service.validate_image_data(image_data)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=error_msg)
+    
+    # Обработка изображения
+    result = ocr_service.extract_text_from_screenshot(image_data)
+    
+    return OCRResponse(
+        extracted_text=result["extracted_text"],
+        processing_time=result["processing_time"],
+        confidence_score=result.get("confidence_score")
+    )
+
+
 @router.post("/ocr", response_model=OCRResponse)
 async def extract_text_from_image(request: OCRRequest):
     """Извлечение текста из изображения (OCR)"""
     try:
-        # Валидация изображения
-        is_valid, error_msg = ocr_service.validate_image_data(request.image_data)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error_msg)
+        # base64 декодируется один раз, дальше передаются только байты
+        try:
+            image_bytes = base64.b64decode(request.image_data)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Неверный формат base64")
         
-        # Обработка изображения
-        result = ocr_service.extract_text_from_screenshot(request.image_data)
-        
-        return OCRResponse(
-            extracted_text=result["extracted_text"],
-            processing_time=result["processing_time"],
-            confidence_score=result.get("confidence_score")
-        )
+        return await asyncio.to_thread(_run_ocr, image_bytes)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing OCR request: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ocr/raw", response_model=OCRResponse)
+async def extract_text_from_raw_image(request: Request):
+    """Извлечение текста из изображения, переданного телом запроса (Content-Type: image/*)"""
+    try:
+        if not request.headers.get("content-type", "").startswith("image/"):
+            raise HTTPException(status_code=415, detail="Ожидается изображение (Content-Type: image/*)")
         
+        image_bytes = await request.body()
+        return await asyncio.to_thread(_run_ocr, image_bytes)
     except HTTPException:
         raise
     except Exception as e:
@@ -334,6 +391,47 @@ async def extract_text_from_image(request: OCRRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/ocr/question", response_model=OCRQuestionResponse)
+async def answer_question_from_raw_image(
+    request: Request,
+    document_ids: List[int] = Query(..., min_length=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Распознавание текста на изображении и поиск ответа на него по документам
+    
+    Объединяет /ocr/raw и /question в один запрос: распознанный текст
+    сразу используется как вопрос
+    """
+    try:
+        if not request.headers.get("content-type", "").startswith("image/"):
+            raise HTTPException(status_code=415, detail="Ожидается изображение (Content-Type: image/*)")
+        
+        ocr_response = await asyncio.to_thread(_run_ocr, await request.body())
+        
+        # Распознанный текст возвращается всегда, даже если ответ получить не удалось:
+        # ошибка вопроса передается отдельно и не превращает весь ответ в ошибку
+        question = ocr_response.extracted_text.strip()
+        is_valid, error_msg = qa_service.validate_question(question)
+        if not is_valid:
+            return OCRQuestionResponse(ocr=ocr_response, answer_error=error_msg)
+        
+        try:
+            answer = await ask_question(
+                QuestionRequest(document_ids=document_ids, question=question),
+                db
+            )
+        except HTTPException as e:
+            return OCRQuestionResponse(ocr=ocr_response, answer_error=str(e.detail))
+        
+        return OCRQuestionResponse(ocr=ocr_response, answer=answer)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing OCR question request: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{document_id}/summaries")
 def get_document_summaries(document_id: int, db: Session = Depends(get_db)):
     """Получение всех конспектов документа"""
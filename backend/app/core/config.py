@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
-import os
+from pathlib import Path
 
 
 class Settings(BaseSettings):
@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     
     # Local AI Models settings
     MODELS_DIR: str = "./models"  # директория для локальных моделей
+    DIRECT_IO: bool = False  # не держать файлы весов в page cache после загрузки
     
     # Русскоязычные модели
     SUMMARIZATION_MODEL: str = "IlyaGusev/ru_sum_gazeta"
@@ -44,7 +45,6 @@ class Settings(BaseSettings):
 # Создаем глобальный экземпляр настроек
 settings = Settings()
 
-# Создаем директории если их нет
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-os.makedirs(settings.VECTOR_DB_PATH, exist_ok=True)
-os.makedirs(settings.MODELS_DIR, exist_ok=True)
\ No newline at end of file
+# Создаем директории если их нет (одинаковые пути создаем один раз)
+for directory in {Path(settings.UPLOAD_DIR), Path(settings.VECTOR_DB_PATH), Path(settings.MODELS_DIR)}:
+    directory.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
@@ -18,6 +20,29 @@ engine = create_engine(
     pool_recycle=3600    # пересоздаем соединения каждый час
 )
 
+# Настройки SQLite для каждого нового соединения: WAL-журнал и меньше fsync
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=30000000000",
+    "PRAGMA cache_size=-65536",
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Применение PRAGMA при открытии соединения с SQLite"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+if settings.DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -44,4 +69,28 @@ def create_tables():
     """
     Создание всех таблиц в базе данных
     """
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+
+
+async def create_tables_async():
+    """
+    Создание всех таблиц без блокировки event loop
+    
+    Для SQLite DDL выполняется через aiosqlite во временном async движке,
+    для остальных СУБД синхронный create_tables уходит в отдельный поток
+    """
+    if not settings.DATABASE_URL.startswith("sqlite:"):
+        await asyncio.to_thread(create_tables)
+        return
+    
+    async_engine = create_async_engine(
+        settings.DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1),
+        connect_args={"timeout": 20}
+    )
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    
+    try:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    finally:
+        await async_engine.dispose()
@@ -1,4 +1,7 @@
 import os
+import json
+import asyncio
+import functools
 import torch
 from transformers import (
     AutoTokenizer, AutoModel, AutoModelForQuestionAnswering,
@@ -7,12 +10,26 @@ from transformers import (
 )
 from sentence_transformers import SentenceTransformer
 import logging
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
 
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# Манифест скачанных моделей: позволяет загружаться без обращений к HF Hub
+MANIFEST_FILENAME = ".manifest.json"
+
+
+@functools.cache
+def _read_manifest(manifest_path: str) -> Dict[str, Any]:
+    """Чтение манифеста моделей (кэшируется на время жизни процесса)"""
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
 class ModelManager:
     """Менеджер для управления локальными моделями"""
@@ -28,31 +45,156 @@ class ModelManager:
         self._summarization_loaded = False
         self._embedding_loaded = False
         self._qa_loaded = False
+        
+        # Параметры периодической очистки кэша CUDA аллокатора
+        self.empty_cache_interval = 64  # очищать раз в N вызовов
+        self.empty_cache_threshold = 0.8  # или при заполнении памяти выше порога
+        self._inference_calls = 0
+        self._cuda_total_memory = (
+            torch.cuda.get_device_properties(0).total_memory if self.device == "cuda" else 0
+        )
+        
+        # Отдельный поток для инференса, чтобы не блокировать event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-inference")
+        
+        # Загружать модели только из локального кэша, без проверки ревизий на HF Hub
+        self.local_files_only = False
+    
+    async def run_inference(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполнение тяжелой работы с моделями в потоке инференса"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(func, *args, **kwargs)
+        )
+    
+    def release_cuda_memory(self):
+        """
+        Периодическое освобождение кэша CUDA после инференса
+        
+        empty_cache сам по себе дорогой, поэтому вызывается не каждый раз,
+        а раз в empty_cache_interval вызовов или при нехватке памяти
+        """
+        if self.device != "cuda":
+            return
+        
+        self._inference_calls += 1
+        
+        memory_usage = torch.cuda.memory_reserved() / self._cuda_total_memory
+        if (
+            self._inference_calls % self.empty_cache_interval == 0
+            or memory_usage > self.empty_cache_threshold
+        ):
+            torch.cuda.empty_cache()
+    
+    @staticmethod
+    def _model_cache_dir(model_name: str) -> str:
+        """Директория кэша конкретной модели"""
+        return os.path.join(settings.MODELS_DIR, model_name.replace("/", "_"))
+    
+    @staticmethod
+    def _configured_models() -> Dict[str, str]:
+        """Модели, указанные в настройках"""
+        return {
+            "summarization": settings.SUMMARIZATION_MODEL,
+            "embedding": settings.EMBEDDING_MODEL,
+            "qa": settings.QA_MODEL
+        }
+    
+    def _model_files_snapshot(self, model_name: str) -> Dict[str, int]:
+        """Размеры файлов в кэше модели (быстрая проверка целостности без хэширования)"""
+        cache_dir = self._model_cache_dir(model_name)
+        files = {}
+        
+        for root, dirs, filenames in os.walk(cache_dir):
+            # Lock-файлы HF не относятся к содержимому модели
+            dirs[:] = [d for d in dirs if d != ".locks"]
+            for filename in filenames:
+                file_path = os.path.join(root, filename)
+                files[os.path.relpath(file_path, cache_dir)] = os.path.getsize(file_path)
+        
+        return files
+    
+    def _manifest_path(self) -> str:
+        return os.path.join(settings.MODELS_DIR, MANIFEST_FILENAME)
+    
+    def write_models_manifest(self):
+        """Сохранение манифеста моделей после успешной загрузки"""
+        manifest = {
+            model_name: {
+                "local_path": self._model_cache_dir(model_name),
+                "files": self._model_files_snapshot(model_name)
+            }
+            for model_name in self._configured_models().values()
+        }
+        
+        try:
+            with open(self._manifest_path(), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write models manifest: {e}")
+        finally:
+            _read_manifest.cache_clear()
+    
+    def clear_manifest_cache(self):
+        """Сброс закэшированного манифеста (например, при принудительной переинициализации)"""
+        _read_manifest.cache_clear()
+    
+    def models_manifest_matches(self) -> bool:
+        """Проверка, что все настроенные модели уже скачаны и не изменились"""
+        manifest = _read_manifest(self._manifest_path())
+        if not manifest:
+            return False
+        
+        for model_name in self._configured_models().values():
+            entry = manifest.get(model_name)
+            if not entry or not entry.get("files"):
+                return False
+            
+            for relative_path, size in entry["files"].items():
+                file_path = os.path.join(self._model_cache_dir(model_name), relative_path)
+                try:
+                    if os.stat(file_path).st_size != size:
+                        return False
+                except OSError:
+                    return False
+        
+        return True
+    
+    def enable_offline_mode(self):
+        """Загрузка моделей только из локального кэша"""
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+        self.local_files_only = True
     
     def _download_and_cache_model(self, model_name: str, model_type: str = "auto"):
         """Загрузка и кэширование модели"""
-        cache_dir = os.path.join(settings.MODELS_DIR, model_name.replace("/", "_"))
+        cache_dir = self._model_cache_dir(model_name)
         
         try:
             if model_type == "summarization":
                 tokenizer = T5Tokenizer.from_pretrained(
                     model_name, 
-                    cache_dir=cache_dir
+                    cache_dir=cache_dir,
+                    local_files_only=self.local_files_only
                 )
                 model = T5ForConditionalGeneration.from_pretrained(
                     model_name,
                     cache_dir=cache_dir,
+                    local_files_only=self.local_files_only,
                     torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
                 ).to(self.device)
                 
             elif model_type == "qa":
                 tokenizer = AutoTokenizer.from_pretrained(
                     model_name,
-                    cache_dir=cache_dir
+                    cache_dir=cache_dir,
+                    local_files_only=self.local_files_only
                 )
                 model = AutoModelForQuestionAnswering.from_pretrained(
                     model_name,
                     cache_dir=cache_dir,
+                    local_files_only=self.local_files_only,
                     torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
                 ).to(self.device)
                 
@@ -60,18 +202,21 @@ class ModelManager:
                 model = SentenceTransformer(
                     model_name,
                     cache_folder=cache_dir,
-                    device=self.device
+                    device=self.device,
+                    local_files_only=self.local_files_only
                 )
                 tokenizer = None
                 
             else:  # auto
                 tokenizer = AutoTokenizer.from_pretrained(
                     model_name,
-                    cache_dir=cache_dir
+                    cache_dir=cache_dir,
+                    local_files_only=self.local_files_only
                 )
                 model = AutoModel.from_pretrained(
                     model_name,
                     cache_dir=cache_dir,
+                    local_files_only=self.local_files_only,
                     torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
                 ).to(self.device)
             
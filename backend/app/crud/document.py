@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from ..models.document import (
@@ -89,6 +89,26 @@ class DocumentCRUD:
             db.rollback()
             raise e
     
+    def get_documents_version(self, db: Session, document_ids: List[int]) -> Tuple:
+        """
+        Версия набора документов для инвалидации кэшей
+        
+        Берется из базы, а не из счетчика в памяти процесса, поэтому изменения,
+        сделанные другим воркером, тоже учитываются. Меняется при добавлении,
+        удалении, обновлении или повторной обработке любого из документов
+        """
+        try:
+            count, max_created, max_updated, max_processed = db.query(
+                func.count(Document.id),
+                func.max(Document.created_at),
+                func.max(Document.updated_at),
+                func.max(Document.processed_at)
+            ).filter(Document.id.in_(document_ids)).one()
+            return (count, str(max_created), str(max_updated), str(max_processed))
+        except Exception as e:
+            db.rollback()
+            raise e
+    
     def update_document(
         self, 
         db: Session, 
@@ -1,12 +1,13 @@
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import logging
 import uvicorn
 
 from .core.config import settings
-from .core.db import create_tables
+from .core.db import create_tables_async
 from .core.model_manager import model_manager, initialize_models
 from .api.router import api_router
 
@@ -27,7 +28,7 @@ async def lifespan(app: FastAPI):
     
     # Создаем таблицы БД
     try:
-        create_tables()
+        await create_tables_async()
         logger.info("Database tables created")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
@@ -36,6 +37,10 @@ async def lifespan(app: FastAPI):
     # Инициализируем модели (в фоновом режиме)
     try:
         logger.info("Initializing AI models...")
+        # Если все модели уже скачаны, загружаем их без обращений к HF Hub
+        if model_manager.models_manifest_matches():
+            model_manager.enable_offline_mode()
+        
         # Загружаем только эмбеддинг модель при старте
         # Остальные модели будут загружаться по мере необходимости
         model_manager.load_embedding_model()
@@ -58,6 +63,8 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error unloading models: {e}")
     
+    model_manager.executor.shutdown(wait=False, cancel_futures=True)
+    
     logger.info("Application shutdown completed")
 
 
@@ -80,6 +87,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие ответов: конспекты, ответы и списки документов - это объемный JSON-текст
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Подключение API роутов
 app.include_router(api_router, prefix="/api")
 
@@ -192,4 +192,10 @@ class OCRRequest(BaseModel):
 class OCRResponse(BaseModel):
     extracted_text: str
     processing_time: float
-    confidence_score: Optional[float] = None
\ No newline at end of file
+    confidence_score: Optional[float] = None
+
+
+class OCRQuestionResponse(BaseModel):
+    ocr: OCRResponse
+    answer: Optional[QuestionResponse] = None  # None, если ответ получить не удалось
+    answer_error: Optional[str] = None  # причина, по которой ответа нет
@@ -1,10 +1,16 @@
-import base64
 import time
 import logging
 import io
+
+try:
+    # SIMD-реализация base64 (тот же API), если установлена
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 from PIL import Image, ImageEnhance, ImageFilter
 import pytesseract
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 from ..core.config import settings
 
@@ -28,9 +34,16 @@ class OCRService:
             "dense_text": "--oem 3 --psm 6"   # плотный текст
         }
     
+    @staticmethod
+    def _decode_image_data(image_data: Union[str, bytes]) -> bytes:
+        """Байты изображения: бинарные данные как есть, строка декодируется из base64"""
+        if isinstance(image_data, str):
+            return base64.b64decode(image_data)
+        return image_data
+    
     def extract_text_from_image(
         self, 
-        image_data: str,
+        image_data: Union[str, bytes],
         config_type: str = "default",
         preprocess: bool = True
     ) -> Dict[str, any]:
@@ -38,7 +51,7 @@ class OCRService:
         Извлечение текста из изображения
         
         Args:
-            image_data: base64 encoded изображение
+            image_data: байты изображения или base64 строка
             config_type: тип конфигурации OCR
             preprocess: применять ли предобработку изображения
         
@@ -48,8 +61,7 @@ class OCRService:
         start_time = time.time()
         
         try:
-            # Декодируем base64 изображение
-            image_bytes = base64.b64decode(image_data)
+            image_bytes = self._decode_image_data(image_data)
             image = Image.open(io.BytesIO(image_bytes))
             
             logger.info(f"Processing image: {image.size}, mode: {image.mode}")
@@ -105,8 +117,9 @@ class OCRService:
     def _preprocess_image(self, image: Image.Image) -> Image.Image:
         """Предобработка изображения для улучшения OCR"""
         try:
-            # Конвертируем в RGB если нужно
-            if image.mode != 'RGB':
+            # Конвертируем в RGB если нужно (изображения в градациях серого,
+            # которые присылает клиент, обрабатываются как есть)
+            if image.mode not in ('RGB', 'L'):
                 image = image.convert('RGB')
             
             # Увеличиваем контрастность
@@ -160,20 +173,23 @@ class OCRService:
     
     def extract_text_from_screenshot(
         self, 
-        image_data: str,
+        image_data: Union[str, bytes],
         auto_detect_text_type: bool = True
     ) -> Dict[str, any]:
         """
         Специализированный метод для обработки скриншотов экрана
         
         Args:
-            image_data: base64 encoded скриншот
+            image_data: байты скриншота или base64 строка
             auto_detect_text_type: автоматически определять тип текста
         
         Returns:
             Dict с результатами OCR оптимизированными для скриншотов
         """
         try:
+            # Декодируем изображение один раз для всех попыток распознавания
+            image_data = self._decode_image_data(image_data)
+            
             # Пробуем разные конфигурации OCR
             configs_to_try = ["default", "dense_text", "sparse_text"]
             
@@ -395,15 +411,15 @@ class OCRService:
         
         return results
     
-    def validate_image_data(self, image_data: str) -> Tuple[bool, Optional[str]]:
-        """Валидация base64 изображения"""
+    def validate_image_data(self, image_data: Union[str, bytes]) -> Tuple[bool, Optional[str]]:
+        """Валидация изображения (байты или base64 строка)"""
         try:
             if not image_data:
                 return False, "Отсутствуют данные изображения"
             
             # Проверяем base64 формат
             try:
-                image_bytes = base64.b64decode(image_data)
+                image_bytes = self._decode_image_data(image_data)
             except Exception:
                 return False, "Неверный формат base64"
             
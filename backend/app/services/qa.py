@@ -2,6 +2,9 @@ import torch
 import time
 import logging
 import json
+import hashlib
+import heapq
+from collections import OrderedDict
 from typing import List, Dict, Optional, Tuple
 from transformers import AutoTokenizer, AutoModelForQuestionAnswering
 
@@ -18,12 +21,18 @@ class QuestionAnsweringService:
     def __init__(self):
         self.max_context_length = 512  # максимальная длина контекста для модели
         self.min_confidence_threshold = 0.1  # минимальный порог уверенности
+        self.max_answer_length = 30  # максимальная длина ответа в токенах
+        
+        # LRU кэш ответов на повторяющиеся вопросы
+        self.answer_cache_size = 1024
+        self._answer_cache: OrderedDict = OrderedDict()
         
     def answer_question(
         self, 
         question: str, 
         document_ids: List[int],
-        context_chunks_limit: int = 5
+        context_chunks_limit: int = 5,
+        documents_version: Optional[Tuple] = None
     ) -> Dict[str, any]:
         """
         Ответ на вопрос на основе документов
@@ -32,12 +41,28 @@ class QuestionAnsweringService:
             question: вопрос пользователя
             document_ids: список ID документов для поиска ответа
             context_chunks_limit: максимальное количество чанков контекста
+            documents_version: версия документов из базы (document_crud.get_documents_version);
+                без нее кэш ответов не используется
         
         Returns:
             Dict с ответом и метаданными
         """
         start_time = time.time()
         
+        # Проверяем кэш ответов
+        cache_key = None
+        if documents_version is not None:
+            cache_key = self._answer_cache_key(
+                question, document_ids, context_chunks_limit, documents_version
+            )
+        cached_result = self._answer_cache.get(cache_key) if cache_key else None
+        if cached_result is not None:
+            self._answer_cache.move_to_end(cache_key)
+            result = dict(cached_result)
+            result["response_time"] = time.time() - start_time
+            logger.info("Question answered from cache")
+            return result
+        
         try:
             # Находим релевантный контекст
             relevant_chunks = vector_search_engine.find_relevant_context(
@@ -74,6 +99,14 @@ class QuestionAnsweringService:
                 "context_sources": self._format_context_sources(relevant_chunks)
             }
             
+            # Сбой генерации не кэшируем, чтобы следующий запрос повторил попытку
+            if "error" in answer_result:
+                result["error"] = answer_result["error"]
+            elif cache_key is not None:
+                self._answer_cache[cache_key] = result
+                if len(self._answer_cache) > self.answer_cache_size:
+                    self._answer_cache.popitem(last=False)
+            
             logger.info(f"Question answered in {result['response_time']:.2f}s with confidence {result['confidence_score']:.2f}")
             return result
             
@@ -88,6 +121,22 @@ class QuestionAnsweringService:
                 "error": str(e)
             }
     
+    def _answer_cache_key(
+        self, 
+        question: str, 
+        document_ids: List[int], 
+        context_chunks_limit: int,
+        documents_version: Tuple
+    ) -> Tuple:
+        """Ключ кэша ответа (учитывает изменения документов)"""
+        question_hash = hashlib.blake2b(question.encode("utf-8"), digest_size=16).digest()
+        return (
+            question_hash,
+            tuple(sorted(document_ids)),
+            context_chunks_limit,
+            documents_version
+        )
+    
     def _prepare_context(self, relevant_chunks: List[Dict]) -> str:
         """Подготовка контекста для модели QA"""
         context_parts = []
@@ -133,28 +182,36 @@ class QuestionAnsweringService:
                 # Находим начало и конец ответа
                 start_scores = outputs.start_logits
                 end_scores = outputs.end_logits
+                seq_len = start_scores.shape[-1]
+                
+                # Оцениваем сразу все пары (начало, конец) одной матрицей
+                span_scores = start_scores[:, :, None] + end_scores[:, None, :]
                 
-                # Получаем лучшие позиции для начала и конца
-                start_idx = torch.argmax(start_scores)
-                end_idx = torch.argmax(end_scores)
+                # Допустимы только спаны с end >= start и ограниченной длиной
+                span_mask = torch.ones(seq_len, seq_len, dtype=torch.bool, device=span_scores.device)
+                span_mask = torch.triu(span_mask) & torch.tril(span_mask, diagonal=self.max_answer_length)
+                span_scores = span_scores.masked_fill(~span_mask, -1e4)
                 
-                # Проверяем валидность позиций
-                if end_idx < start_idx:
-                    end_idx = start_idx + 10  # берем небольшой фрагмент
+                # Лучший спан и его вероятность (без материализации полного softmax)
+                flat_scores = span_scores.view(span_scores.shape[0], -1)
+                best_span = flat_scores.argmax(dim=-1)
+                best_score = flat_scores.gather(1, best_span[:, None])[:, 0]
+                confidence = (best_score - torch.logsumexp(flat_scores, dim=-1)).exp()[0].item()
+                start_idx, end_idx = divmod(best_span[0].item(), seq_len)
                 
                 # Извлекаем ответ
                 input_ids = inputs["input_ids"][0]
                 answer_tokens = input_ids[start_idx:end_idx + 1]
                 answer = tokenizer.decode(answer_tokens, skip_special_tokens=True)
                 
-                # Вычисляем уверенность
-                start_prob = torch.softmax(start_scores, dim=-1)[0][start_idx].item()
-                end_prob = torch.softmax(end_scores, dim=-1)[0][end_idx].item()
-                confidence = (start_prob + end_prob) / 2
-                
                 # Подсчитываем использованные токены
                 tokens_used = len(input_ids) + len(answer_tokens)
             
+            # Освобождаем тензоры сразу, не дожидаясь сборщика мусора
+            del inputs, outputs, start_scores, end_scores, span_scores, span_mask, flat_scores
+            del best_span, best_score, input_ids, answer_tokens
+            model_manager.release_cuda_memory()
+            
             # Постобработка ответа
             answer = self._postprocess_answer(answer, question)
             
@@ -169,7 +226,8 @@ class QuestionAnsweringService:
             return {
                 "answer": "Не удалось сгенерировать ответ на вопрос.",
                 "confidence": 0.0,
-                "tokens_used": 0
+                "tokens_used": 0,
+                "error": str(e)
             }
     
     def _postprocess_answer(self, answer: str, question: str) -> str:
@@ -293,7 +351,7 @@ class QuestionAnsweringService:
                 word_freq[word] = word_freq.get(word, 0) + 1
         
         # Сортируем по частоте и берем топ слова
-        top_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_words = heapq.nlargest(10, word_freq.items(), key=lambda x: x[1])
         
         return [word[0] for word in top_words]
 
@@ -1,7 +1,10 @@
+import re
+import heapq
 import torch
 import time
 import logging
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from transformers import T5ForConditionalGeneration, T5Tokenizer
 
 from ..core.model_manager import model_manager
@@ -10,6 +13,11 @@ from ..schemas.document import SummaryType
 
 logger = logging.getLogger(__name__)
 
+# Предкомпилированные шаблоны для очистки текста
+_RE_WHITESPACE = re.compile(r'\s+')
+_RE_REPEATED_END_PUNCT = re.compile(r'([.!?]){2,}')
+_RE_REPEATED_SEPARATORS = re.compile(r'([,;:]){2,}')
+
 
 class DocumentSummarizer:
     """Сервис для создания конспектов документов с использованием локальной модели"""
@@ -17,6 +25,7 @@ class DocumentSummarizer:
     def __init__(self):
         self.max_input_length = 512  # максимальная длина входного текста для модели
         self.max_output_length = 256  # максимальная длина выходного текста
+        self.cuda_streams_count = 2  # количество CUDA streams для параллельной обработки чанков
         
         # Настройки генерации для разных типов конспектов
         self.generation_configs = {
@@ -46,40 +55,54 @@ class DocumentSummarizer:
             }
         }
     
-    def _prepare_text_for_summarization(self, text: str) -> List[str]:
-        """Подготовка текста для суммаризации - разбиение на подходящие чанки"""
-        # Удаляем лишние пробелы и переносы
-        text = ' '.join(text.split())
+    def _input_token_budget(self, tokenizer: T5Tokenizer) -> int:
+        """Сколько токенов текста помещается во вход модели с учетом префикса"""
+        prompt_length = len(tokenizer.encode("summarize: "))
+        return self.max_input_length - prompt_length
+    
+    def _token_lengths(self, texts: List[str], tokenizer: T5Tokenizer) -> List[int]:
+        """Длины текстов в токенах (одним батчем)"""
+        if not texts:
+            return []
+        encoded = tokenizer(texts, add_special_tokens=False, return_length=True)
+        return list(encoded["length"])
+    
+    def _pack_by_tokens(
+        self,
+        texts: List[str],
+        tokenizer: T5Tokenizer,
+        separator: str
+    ) -> List[str]:
+        """Упаковка фрагментов в группы, близкие к лимиту токенов модели"""
+        budget = self._input_token_budget(tokenizer)
         
-        # Разбиваем на чанки по предложениям, соблюдая лимит токенов
-        sentences = text.split('.')
-        chunks = []
-        current_chunk = []
+        groups = []
+        current_group = []
         current_length = 0
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-            
-            # Примерная оценка длины в токенах (1 токен ≈ 4 символа для русского)
-            sentence_token_length = len(sentence) // 3
+        for text, length in zip(texts, self._token_lengths(texts, tokenizer)):
+            if current_group and current_length + length > budget:
+                groups.append(separator.join(current_group))
+                current_group = []
+                current_length = 0
             
-            if current_length + sentence_token_length > self.max_input_length and current_chunk:
-                chunk_text = '. '.join(current_chunk) + '.'
-                chunks.append(chunk_text)
-                current_chunk = [sentence]
-                current_length = sentence_token_length
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_token_length
+            current_group.append(text)
+            current_length += length
         
-        # Добавляем последний чанк
-        if current_chunk:
-            chunk_text = '. '.join(current_chunk) + '.'
-            chunks.append(chunk_text)
+        if current_group:
+            groups.append(separator.join(current_group))
         
-        return chunks
+        return groups
+    
+    def _prepare_text_for_summarization(self, text: str, tokenizer: T5Tokenizer) -> List[str]:
+        """Подготовка текста для суммаризации - разбиение на подходящие чанки"""
+        # Удаляем лишние пробелы и переносы
+        text = ' '.join(text.split())
+        
+        # Разбиваем на чанки по предложениям, соблюдая лимит токенов
+        sentences = [sentence.strip() for sentence in text.split('.') if sentence.strip()]
+        
+        return [chunk + '.' for chunk in self._pack_by_tokens(sentences, tokenizer, '. ')]
     
     def _summarize_chunk(
         self, 
@@ -100,7 +123,13 @@ class DocumentSummarizer:
             max_length=self.max_input_length,
             truncation=True,
             padding=True
-        ).to(model_manager.device)
+        )
+        
+        if model_manager.device == "cuda":
+            # Асинхронное копирование на GPU из закрепленной памяти
+            inputs = inputs.pin_memory().to(model_manager.device, non_blocking=True)
+        else:
+            inputs = inputs.to(model_manager.device)
         
         # Получаем конфигурацию генерации
         gen_config = self.generation_configs[summary_type]
@@ -123,8 +152,81 @@ class DocumentSummarizer:
         # Декодирование результата
         summary = tokenizer.decode(outputs[0], skip_special_tokens=True)
         
+        # Освобождаем тензоры сразу, не дожидаясь сборщика мусора
+        del inputs, outputs
+        model_manager.release_cuda_memory()
+        
         return summary.strip()
     
+    def _summarize_chunk_safe(
+        self,
+        chunk_index: int,
+        chunks_count: int,
+        text_chunk: str,
+        summary_type: SummaryType,
+        model: T5ForConditionalGeneration,
+        tokenizer: T5Tokenizer
+    ) -> Tuple[str, int]:
+        """Суммаризация чанка с подсчетом токенов и обработкой ошибок"""
+        try:
+            chunk_summary = self._summarize_chunk(text_chunk, summary_type, model, tokenizer)
+            
+            # Подсчитываем токены (приблизительно)
+            tokens_used = len(tokenizer.encode(text_chunk)) + len(tokenizer.encode(chunk_summary))
+            
+            logger.info(f"Summarized chunk {chunk_index+1}/{chunks_count}")
+            return chunk_summary, tokens_used
+            
+        except Exception as e:
+            logger.error(f"Error summarizing chunk {chunk_index}: {e}")
+            return f"[Ошибка обработки фрагмента {chunk_index+1}]", 0
+    
+    def _summarize_chunks(
+        self,
+        text_chunks: List[str],
+        summary_type: SummaryType,
+        model: T5ForConditionalGeneration,
+        tokenizer: T5Tokenizer
+    ) -> List[Tuple[str, int]]:
+        """
+        Суммаризация списка чанков
+        
+        На GPU чанки распределяются по нескольким CUDA streams, каждый stream
+        обслуживается своим потоком, чтобы копирование и вычисления перекрывались.
+        
+        Returns:
+            List[Tuple[str, int]]: (конспект чанка, использовано токенов) в исходном порядке
+        """
+        chunks_count = len(text_chunks)
+        
+        if model_manager.device != "cuda" or chunks_count < 2:
+            return [
+                self._summarize_chunk_safe(i, chunks_count, chunk, summary_type, model, tokenizer)
+                for i, chunk in enumerate(text_chunks)
+            ]
+        
+        streams = [torch.cuda.Stream() for _ in range(min(self.cuda_streams_count, chunks_count))]
+        
+        def process_stream(stream_index: int) -> List[Tuple[int, Tuple[str, int]]]:
+            # Каждый поток обрабатывает свою долю чанков в своем CUDA stream
+            with torch.cuda.stream(streams[stream_index]):
+                return [
+                    (i, self._summarize_chunk_safe(
+                        i, chunks_count, text_chunks[i], summary_type, model, tokenizer
+                    ))
+                    for i in range(stream_index, chunks_count, len(streams))
+                ]
+        
+        with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+            stream_results = list(executor.map(process_stream, range(len(streams))))
+        
+        for stream in streams:
+            stream.synchronize()
+        
+        results = [item for stream_result in stream_results for item in stream_result]
+        results.sort(key=lambda x: x[0])
+        return [result for _, result in results]
+    
     def summarize_document(
         self, 
         document_text: str, 
@@ -143,45 +245,39 @@ class DocumentSummarizer:
             model, tokenizer = model_manager.get_summarization_model()
             
             # Подготавливаем текст
-            text_chunks = self._prepare_text_for_summarization(document_text)
+            text_chunks = self._prepare_text_for_summarization(document_text, tokenizer)
             logger.info(f"Document split into {len(text_chunks)} chunks for summarization")
             
             # Суммаризируем каждый чанк
-            chunk_summaries = []
-            total_tokens = 0
-            
-            for i, chunk in enumerate(text_chunks):
-                try:
-                    chunk_summary = self._summarize_chunk(chunk, summary_type, model, tokenizer)
-                    chunk_summaries.append(chunk_summary)
-                    
-                    # Подсчитываем токены (приблизительно)
-                    tokens_used = len(tokenizer.encode(chunk)) + len(tokenizer.encode(chunk_summary))
-                    total_tokens += tokens_used
-                    
-                    logger.info(f"Summarized chunk {i+1}/{len(text_chunks)}")
-                    
-                except Exception as e:
-                    logger.error(f"Error summarizing chunk {i}: {e}")
-                    chunk_summaries.append(f"[Ошибка обработки фрагмента {i+1}]")
+            chunk_results = self._summarize_chunks(text_chunks, summary_type, model, tokenizer)
+            level_summaries = [summary for summary, _ in chunk_results]
+            total_tokens = sum(tokens for _, tokens in chunk_results)
             
-            # Объединяем конспекты чанков
-            if len(chunk_summaries) > 1:
-                # Если чанков много, создаем финальный конспект из конспектов чанков
-                combined_summaries = "\n\n".join(chunk_summaries)
+            # Иерархически сводим конспекты, пока они не поместятся в один вход модели
+            budget = self._input_token_budget(tokenizer)
+            while (
+                len(level_summaries) > 1
+                and sum(self._token_lengths(level_summaries, tokenizer)) > budget
+            ):
+                groups = self._pack_by_tokens(level_summaries, tokenizer, "\n\n")
                 
-                if len(combined_summaries) > self.max_input_length * 3:  # если слишком длинно
-                    # Создаем конспект конспектов
-                    final_summary = self._summarize_chunk(
-                        combined_summaries, 
-                        summary_type, 
-                        model, 
-                        tokenizer
-                    )
-                else:
-                    final_summary = combined_summaries
+                if len(groups) >= len(level_summaries):
+                    # Каждый конспект сам по себе близок к лимиту - сводим попарно
+                    groups = [
+                        "\n\n".join(level_summaries[i:i + 2])
+                        for i in range(0, len(level_summaries), 2)
+                    ]
+                
+                logger.info(f"Reducing {len(level_summaries)} summaries into {len(groups)}")
+                
+                group_results = self._summarize_chunks(groups, summary_type, model, tokenizer)
+                level_summaries = [summary for summary, _ in group_results]
+                total_tokens += sum(tokens for _, tokens in group_results)
+            
+            if level_summaries:
+                final_summary = "\n\n".join(level_summaries)
             else:
-                final_summary = chunk_summaries[0] if chunk_summaries else "Не удалось создать конспект"
+                final_summary = "Не удалось создать конспект"
             
             generation_time = time.time() - start_time
             
@@ -227,13 +323,11 @@ class TextProcessor:
     def clean_text(text: str) -> str:
         """Очистка текста от мусора"""
         # Удаляем лишние пробелы и переносы
-        text = ' '.join(text.split())
+        text = _RE_WHITESPACE.sub(' ', text)
         
         # Удаляем повторяющиеся символы
-        import re
-        text = re.sub(r'([.!?]){2,}', r'\1', text)
-        text = re.sub(r'([,;:]){2,}', r'\1', text)
-        text = re.sub(r'\s{2,}', ' ', text)
+        text = _RE_REPEATED_END_PUNCT.sub(r'\1', text)
+        text = _RE_REPEATED_SEPARATORS.sub(r'\1', text)
         
         return text.strip()
     
@@ -244,12 +338,7 @@ class TextProcessor:
         
         # Простая эвристика: берем самые длинные предложения
         # (обычно они содержат больше информации)
-        sentences_with_length = [(s, len(s)) for s in sentences]
-        sentences_with_length.sort(key=lambda x: x[1], reverse=True)
-        
-        key_sentences = [s[0] for s in sentences_with_length[:count]]
-        
-        return key_sentences
+        return heapq.nlargest(count, sentences, key=len)
     
     @staticmethod
     def count_words(text: str) -> Dict[str, int]:
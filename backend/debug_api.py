@@ -9,13 +9,20 @@ sys.path.append(os.path.dirname(__file__))
 from app.core.db import SessionLocal, engine
 from app.models.document import Document
 from app.crud.document import document_crud
-from sqlalchemy import text
+from sqlalchemy import text, select, func
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _documents_listing_query():
+    """Запрос списка документов без загрузки лишних колонок (потоково, пачками)"""
+    return select(
+        Document.id, Document.original_filename, Document.processing_status
+    ).execution_options(yield_per=500)
+
+
 def check_database():
     """Проверка состояния базы данных"""
     print("🔍 Проверка базы данных...")
@@ -37,10 +44,10 @@ def check_database():
         # Проверяем документы
         db = SessionLocal()
         try:
-            documents = db.query(Document).all()
-            print(f"📄 Документов в БД: {len(documents)}")
+            documents_count = db.scalar(select(func.count(Document.id)))
+            print(f"📄 Документов в БД: {documents_count}")
             
-            for doc in documents:
+            for doc in db.execute(_documents_listing_query()):
                 print(f"   - ID: {doc.id}, Файл: {doc.original_filename}, Статус: {doc.processing_status}")
         finally:
             db.close()
@@ -57,6 +64,8 @@ def check_api_endpoints():
     print("\n🌐 Проверка API эндпоинтов...")
     
     import requests
+    from requests.adapters import HTTPAdapter
+    from concurrent.futures import ThreadPoolExecutor
     
     base_url = "http://127.0.0.1:8000"
     endpoints = [
@@ -66,10 +75,26 @@ def check_api_endpoints():
         ("/models/info", "GET")
     ]
     
-    for endpoint, method in endpoints:
+    # Одна сессия с пулом соединений (keep-alive) для всех запросов
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+    
+    def send_request(endpoint_info):
+        endpoint, method = endpoint_info
+        try:
+            return session.request(method, f"{base_url}{endpoint}", timeout=5)
+        except Exception as e:
+            return e
+    
+    # Опрашиваем эндпоинты параллельно
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(send_request, endpoints))
+    session.close()
+    
+    for (endpoint, method), response in zip(endpoints, responses):
         try:
-            if method == "GET":
-                response = requests.get(f"{base_url}{endpoint}", timeout=5)
+            if isinstance(response, Exception):
+                raise response
             
             if response.status_code == 200:
                 print(f"✅ {method} {endpoint} - OK")
@@ -236,9 +261,9 @@ def main():
             elif choice == "3":
                 db = SessionLocal()
                 try:
-                    docs = db.query(Document).all()
-                    print(f"\n📚 Все документы ({len(docs)}):")
-                    for doc in docs:
+                    docs_count = db.scalar(select(func.count(Document.id)))
+                    print(f"\n📚 Все документы ({docs_count}):")
+                    for doc in db.execute(_documents_listing_query()):
                         print(f"   ID: {doc.id} | {doc.original_filename} | {doc.processing_status}")
                 finally:
                     db.close()
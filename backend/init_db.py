@@ -4,39 +4,216 @@
 """
 import sys
 import os
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+import mmap
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
 
 # Добавляем путь к приложению
 sys.path.append(os.path.dirname(__file__))
 
-from app.core.db import create_tables, engine
-from app.core.model_manager import initialize_models
+from app.core.db import create_tables_async
+from app.models import document as document_models  # noqa: F401 - регистрация таблиц в Base.metadata
+from app.core.model_manager import model_manager, initialize_models
 from app.core.config import settings
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Файлы моделей, которые стоит заранее поднять в page cache
+MODEL_FILE_PATTERNS = ("*.safetensors", "*.bin", "*.gguf", "tokenizer*")
 
-def init_database():
+# Флаг MAP_POPULATE есть только в Linux (значение 0x8000 в заголовках ядра)
+MAP_POPULATE = getattr(mmap, "MAP_POPULATE", 0x8000 if sys.platform.startswith("linux") else 0)
+
+PREFETCH_READ_CHUNK = 8 * 1024 * 1024
+
+# Крупные файлы весов отдаем на асинхронное чтение ядру через posix_fadvise
+FADVISE_MIN_SIZE = 64 * 1024 * 1024
+
+# Файл-отметка успешной инициализации базы данных
+DB_READY_MARKER = ".db_ready"
+
+# Статические заголовки скрипта
+_SEPARATOR = "=" * 60 + "\n"
+_HEADER = f"{_SEPARATOR}Document AI Assistant - Database and Models Initialization\n{_SEPARATOR}"
+_FOOTER = (
+    f"\n{_SEPARATOR}Initialization completed!\n{_SEPARATOR}"
+    "You can now start the application with:\n"
+    f"  cd {os.path.dirname(__file__)}\n"
+    "  python -m uvicorn app.main:app --host 127.0.0.1 --port 8000 --reload\n"
+    "\n"
+    "API will be available at: http://127.0.0.1:8000\n"
+    "API Documentation: http://127.0.0.1:8000/docs\n"
+)
+
+
+def _find_model_files(path):
+    """Поиск файлов весов и токенизаторов в директории моделей"""
+    files = set()
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in MODEL_FILE_PATTERNS):
+                # Кэш HF хранит снапшоты как симлинки на blobs - читаем каждый blob один раз
+                files.add(os.path.realpath(os.path.join(root, filename)))
+    return sorted(files)
+
+
+def _prefetch_file(file_path):
+    """Загрузка одного файла в page cache, возвращает размер в байтах"""
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return 0
+    
+    if size > FADVISE_MIN_SIZE and hasattr(os, "posix_fadvise"):
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            # Ядро ставит файл в очередь на чтение и увеличивает окно readahead,
+            # вызов возвращается сразу, не дожидаясь диска
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        finally:
+            os.close(fd)
+    elif MAP_POPULATE:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            # MAP_POPULATE заставляет ядро прочитать все страницы сразу при mmap
+            with mmap.mmap(fd, 0, flags=mmap.MAP_PRIVATE | MAP_POPULATE, prot=mmap.PROT_READ):
+                pass
+        finally:
+            os.close(fd)
+    else:
+        # Без MAP_POPULATE (Windows, macOS) просто читаем файл крупными блоками
+        with open(file_path, "rb", buffering=0) as f:
+            while f.read(PREFETCH_READ_CHUNK):
+                pass
+    
+    return size
+
+
+def _safe_prefetch_file(file_path):
+    """Прогрев файла без прерывания общей загрузки при ошибках"""
+    try:
+        return _prefetch_file(file_path)
+    except OSError as e:
+        logger.warning(f"Could not prefetch {file_path}: {e}")
+        return 0
+
+
+def _prefetch_model_dir(path):
+    """
+    Параллельный прогрев page cache файлами моделей
+    
+    Последовательные from_pretrained читают веса с диска в один поток,
+    поэтому заранее читаем все файлы параллельно, чтобы загрузить диск полностью
+    """
+    files = _find_model_files(path)
+    if not files:
+        return 0
+    
+    max_workers = min(32, (os.cpu_count() or 1) * 4, len(files))
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-prefetch") as executor:
+        total_bytes = sum(executor.map(_safe_prefetch_file, files))
+    
+    logger.info(f"Prefetched {len(files)} model files ({total_bytes / 1024 ** 2:.0f} MB)")
+    return total_bytes
+
+
+def _drop_model_dir_from_cache(path):
+    """
+    Вытеснение файлов моделей из page cache после загрузки
+    
+    Веса читаются один раз при старте и дальше живут в памяти процесса,
+    поэтому их копия в page cache только вытесняет полезные данные
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    
+    for file_path in _find_model_files(path):
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"Could not drop {file_path} from page cache: {e}")
+
+
+async def init_database_async():
     """Инициализация базы данных"""
     try:
         logger.info("Creating database tables...")
-        create_tables()
+        await create_tables_async()
         logger.info("Database tables created successfully")
+        
+        # Отметка для start_server.py, что база уже инициализирована
+        Path(settings.MODELS_DIR, DB_READY_MARKER).touch()
         return True
     except Exception as e:
         logger.error(f"Error creating database: {e}")
         return False
 
 
-def download_models():
+def init_database():
+    """Синхронная обертка над init_database_async"""
+    return asyncio.run(init_database_async())
+
+
+def _start_cuda_warmup():
+    """
+    Фоновая инициализация CUDA контекста и cuBLAS
+    
+    Первый перенос модели на GPU ждет создания контекста несколько секунд,
+    поэтому создаем его заранее, пока идет прогрев файлов и создание таблиц
+    """
+    if model_manager.device != "cuda":
+        return
+    
+    def warmup():
+        try:
+            matrix = torch.zeros(8, 8, device="cuda")
+            matrix @ matrix
+            torch.cuda.synchronize()
+        except Exception as e:
+            logger.warning(f"CUDA warmup failed: {e}")
+    
+    threading.Thread(target=warmup, name="cuda-warmup", daemon=True).start()
+
+
+def download_models(force: bool = False):
     """Загрузка и кэширование моделей"""
     try:
+        if force:
+            model_manager.clear_manifest_cache()
+        elif model_manager.models_manifest_matches():
+            # Все модели уже скачаны и совпадают с манифестом - загружать нечего
+            logger.info("All models are already cached, skipping initialization")
+            return True
+        
+        _start_cuda_warmup()
+        
         logger.info("Downloading and caching AI models...")
         logger.info("This may take several minutes on first run...")
         
+        # Поднимаем уже скачанные веса в page cache перед загрузкой моделей
+        if not settings.DIRECT_IO:
+            _prefetch_model_dir(settings.MODELS_DIR)
+        
         success = initialize_models()
+        
+        if settings.DIRECT_IO:
+            _drop_model_dir_from_cache(settings.MODELS_DIR)
+        
         if success:
+            model_manager.write_models_manifest()
             logger.info("All models downloaded and cached successfully")
             return True
         else:
@@ -48,62 +225,107 @@ def download_models():
         return False
 
 
+async def download_models_async(force: bool = False):
+    """Загрузка моделей в отдельном потоке, не блокируя event loop"""
+    return await asyncio.to_thread(download_models, force)
+
+
+async def _initialize(with_models: bool, force: bool = False):
+    """
+    Параллельная инициализация базы данных и моделей
+    
+    DDL SQLite и загрузка моделей не зависят друг от друга, поэтому
+    выполняются одновременно
+    
+    Returns:
+        (успех инициализации БД, успех загрузки моделей)
+    """
+    tasks = [init_database_async()]
+    if with_models:
+        tasks.append(download_models_async(force))
+    
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error(f"Initialization step failed: {result}")
+    
+    db_success = results[0] is True
+    models_success = results[1] is True if with_models else True
+    return db_success, models_success
+
+
+def _confirm_model_download() -> bool:
+    """
+    Нужно ли загружать модели
+    
+    SKIP_MODEL_DOWNLOAD=1 пропускает загрузку, MONKEY_AUTO=1 или запуск без
+    терминала (CI, docker build) соглашаются без вопроса
+    """
+    if os.environ.get("SKIP_MODEL_DOWNLOAD", "0") == "1":
+        return False
+    
+    if os.environ.get("MONKEY_AUTO", "0") == "1" or not sys.stdin.isatty():
+        return True
+    
+    user_input = input("   Download AI models now? [Y/n]: ").strip().lower()
+    return not user_input or user_input in ('y', 'yes')
+
+
 def main():
     """Основная функция инициализации"""
-    print("=" * 60)
-    print("Document AI Assistant - Database and Models Initialization")
-    print("=" * 60)
-    
-    # Создаем необходимые директории
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    os.makedirs(settings.VECTOR_DB_PATH, exist_ok=True)
-    os.makedirs(settings.MODELS_DIR, exist_ok=True)
-    
-    print(f"Configuration:")
-    print(f"  Database: {settings.DATABASE_URL}")
-    print(f"  Upload directory: {settings.UPLOAD_DIR}")
-    print(f"  Models directory: {settings.MODELS_DIR}")
-    print(f"  Vector DB directory: {settings.VECTOR_DB_PATH}")
+    parser = argparse.ArgumentParser(description="Document AI Assistant initialization")
+    parser.add_argument(
+        "--direct-io",
+        action="store_true",
+        help="Do not keep model weight files in the page cache after loading"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reload all models even if they are already cached"
+    )
+    args = parser.parse_args()
+    
+    if args.direct_io:
+        settings.DIRECT_IO = True
+    
+    sys.stdout.write(
+        f"{_HEADER}"
+        f"Configuration:\n"
+        f"  Database: {settings.DATABASE_URL}\n"
+        f"  Upload directory: {settings.UPLOAD_DIR}\n"
+        f"  Models directory: {settings.MODELS_DIR}\n"
+        f"  Vector DB directory: {settings.VECTOR_DB_PATH}\n\n"
+    )
+    
+    # Загрузка моделей
+    print("Models: this will download several GB of models on first run...")
+    
+    with_models = _confirm_model_download()
+    if not with_models:
+        print("   Skipping model download. Models will be downloaded on first use.")
     print()
     
-    # Инициализация БД
+    # Инициализация БД и загрузка моделей выполняются одновременно
     print("1. Initializing database...")
-    db_success = init_database()
+    if with_models:
+        print("2. Downloading AI models...")
+    
+    db_success, models_success = asyncio.run(_initialize(with_models, args.force))
     
     if not db_success:
         print("❌ Database initialization failed!")
         return 1
     
     print("✅ Database initialized successfully")
-    print()
-    
-    # Загрузка моделей
-    print("2. Downloading AI models...")
-    print("   This will download several GB of models on first run...")
-    
-    user_input = input("   Continue? [Y/n]: ").strip().lower()
-    if user_input and user_input != 'y' and user_input != 'yes':
-        print("   Skipping model download. Models will be downloaded on first use.")
-        models_success = True
-    else:
-        models_success = download_models()
     
     if not models_success:
         print("⚠️  Model download failed, but application can still run")
         print("   Models will be downloaded automatically on first use")
-    else:
+    elif with_models:
         print("✅ Models downloaded successfully")
     
-    print()
-    print("=" * 60)
-    print("Initialization completed!")
-    print("=" * 60)
-    print("You can now start the application with:")
-    print(f"  cd {os.path.dirname(__file__)}")
-    print("  python -m uvicorn app.main:app --host 127.0.0.1 --port 8000 --reload")
-    print()
-    print("API will be available at: http://127.0.0.1:8000")
-    print("API Documentation: http://127.0.0.1:8000/docs")
+    sys.stdout.write(_FOOTER)
     
     return 0
 
@@ -4,71 +4,232 @@
 """
 import sys
 import os
+import json
+import ctypes
+import shutil
+import hashlib
+import tempfile
+import ctypes.util
 import subprocess
 import argparse
+from importlib.util import find_spec
+from importlib.metadata import version
+from pathlib import Path
+from typing import Optional
 
 # Добавляем путь к приложению
 sys.path.append(os.path.dirname(__file__))
 
 from app.core.config import settings
 
+# Статический заголовок скрипта
+_SEPARATOR = "=" * 60 + "\n"
+_HEADER = f"{_SEPARATOR}Document AI Assistant - Server Startup\n{_SEPARATOR}"
+
+
+def _database_ready() -> bool:
+    """Проверка, что база данных уже инициализирована"""
+    # init_db.py оставляет отметку после успешного создания таблиц
+    if Path(settings.MODELS_DIR, ".db_ready").is_file():
+        return True
+    
+    # Иначе смотрим на сам файл SQLite, путь берем из DATABASE_URL
+    if settings.DATABASE_URL.startswith("sqlite:///"):
+        return os.path.exists(settings.DATABASE_URL[len("sqlite:///"):])
+    
+    # Для других СУБД наличие базы здесь не проверить
+    return True
+
+
+# Состояние базы определяем один раз при импорте модуля
+DATABASE_READY = _database_ready()
+
+
+REQUIRED_MODULES = [
+    "torch",
+    "transformers",
+    "fastapi",
+    "sqlalchemy",
+    "fitz",  # PyMuPDF
+    "pytesseract",
+]
+
 
 def check_dependencies():
     """Проверка установленных зависимостей"""
+    # find_spec только находит пакет, не загружая его (и нативные библиотеки torch)
+    missing = [name for name in REQUIRED_MODULES if find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing dependency: {', '.join(missing)}")
+        print("Please install requirements: pip install -r requirements.txt")
+        return False
+    
+    # Версии берем из метаданных пакетов, не обращаясь к атрибутам модулей
+    print(f"✅ All dependencies installed")
+    print(f"   PyTorch: {version('torch')}")
+    print(f"   Transformers: {version('transformers')}")
+    print(f"   FastAPI: {version('fastapi')}")
+    return True
+
+
+def _dependencies_marker() -> Optional[Path]:
+    """
+    Файл-отметка успешной проверки зависимостей
+    
+    Имя зависит от времени изменения requirements.txt и интерпретатора,
+    поэтому после обновления зависимостей проверка выполняется заново
+    """
+    requirements_file = Path(__file__).with_name("requirements.txt")
     try:
-        import torch
-        import transformers
-        import fastapi
-        import sqlalchemy
-        import fitz  # PyMuPDF
-        import pytesseract
-        print(f"✅ All dependencies installed")
-        print(f"   PyTorch: {torch.__version__}")
-        print(f"   Transformers: {transformers.__version__}")
-        print(f"   FastAPI: {fastapi.__version__}")
+        requirements_mtime = requirements_file.stat().st_mtime
+    except OSError:
+        return None
+    
+    key = hashlib.blake2b(
+        f"{requirements_mtime}:{sys.executable}".encode(),
+        digest_size=16
+    ).hexdigest()
+    return Path(tempfile.gettempdir()) / f"mnk_deps_{key}.ok"
+
+
+def check_dependencies_cached():
+    """Проверка зависимостей с запоминанием успешного результата между запусками"""
+    marker = _dependencies_marker()
+    if marker is not None and marker.exists():
+        print("✅ All dependencies installed (cached check)")
         return True
-    except ImportError as e:
-        print(f"❌ Missing dependency: {e}")
-        print("Please install requirements: pip install -r requirements.txt")
+    
+    if not check_dependencies():
         return False
+    
+    if marker is not None:
+        try:
+            marker.touch()
+        except OSError:
+            pass
+    return True
 
 
-def check_tesseract():
-    """Проверка Tesseract OCR"""
+# Кэш версии Tesseract между запусками, ключ - inode и mtime бинарника
+TESSERACT_VERSION_CACHE = Path.home() / ".cache" / "monkeyagent" / "tess.json"
+
+
+def _tesseract_binary() -> Optional[str]:
+    """Путь к исполняемому файлу Tesseract"""
+    if settings.TESSERACT_PATH and os.path.isfile(settings.TESSERACT_PATH):
+        return settings.TESSERACT_PATH
+    return shutil.which("tesseract")
+
+
+def _tesseract_cache_key(binary: str) -> str:
+    """Ключ кэша: меняется при переустановке или обновлении Tesseract"""
+    binary_stat = os.stat(binary)
+    return f"{binary}:{binary_stat.st_ino}-{int(binary_stat.st_mtime)}"
+
+
+def _read_tesseract_cache() -> dict:
+    try:
+        return json.loads(TESSERACT_VERSION_CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_tesseract_cache(key: str, version: str):
+    cache = _read_tesseract_cache()
+    cache[key] = version
+    try:
+        TESSERACT_VERSION_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        TESSERACT_VERSION_CACHE.write_text(json.dumps(cache), encoding="utf-8")
+    except OSError:
+        pass
+
+
+def _tesseract_version_from_library() -> Optional[str]:
+    """Версия Tesseract из libtesseract без запуска отдельного процесса"""
+    library_path = ctypes.util.find_library("tesseract")
+    if not library_path:
+        return None
+    
+    try:
+        library = ctypes.CDLL(library_path)
+        library.TessVersion.restype = ctypes.c_char_p
+        return f"tesseract {library.TessVersion().decode()}"
+    except (OSError, AttributeError):
+        return None
+
+
+def _tesseract_version_from_binary(binary: str) -> Optional[str]:
+    """Версия Tesseract из вывода `tesseract --version`"""
     try:
-        result = subprocess.run(['tesseract', '--version'], 
+        result = subprocess.run([binary, '--version'], 
                                capture_output=True, text=True)
         if result.returncode == 0:
-            version_line = result.stdout.split('\n')[0]
-            print(f"✅ Tesseract OCR: {version_line}")
-            return True
+            return result.stdout.split('\n')[0]
     except FileNotFoundError:
         pass
     
+    return None
+
+
+def check_tesseract():
+    """Проверка Tesseract OCR"""
+    # Версия не меняется за время жизни процесса - определяем ее один раз
+    if not hasattr(check_tesseract, "version"):
+        binary = _tesseract_binary()
+        cache_key = _tesseract_cache_key(binary) if binary else None
+        
+        version = _read_tesseract_cache().get(cache_key) if cache_key else None
+        if version is None:
+            version = _tesseract_version_from_library()
+            if version is None and binary:
+                version = _tesseract_version_from_binary(binary)
+            if version and cache_key:
+                _write_tesseract_cache(cache_key, version)
+        
+        check_tesseract.version = version
+    
+    if check_tesseract.version:
+        print(f"✅ Tesseract OCR: {check_tesseract.version}")
+        return True
+    
     print("⚠️  Tesseract OCR not found")
     print("   Install: sudo apt-get install tesseract-ocr tesseract-ocr-rus")
     print("   Or set TESSERACT_PATH in .env file")
     return False
 
 
-def start_server(host: str, port: int, reload: bool = False):
+def start_server(
+    host: str,
+    port: int,
+    reload: bool = False,
+    workers: int = 1,
+    log_level: str = "info"
+):
     """Запуск FastAPI сервера"""
     try:
         import uvicorn
         
-        print(f"🚀 Starting Document AI Assistant...")
-        print(f"   Host: {host}")
-        print(f"   Port: {port}")
-        print(f"   Debug mode: {reload}")
-        print(f"   API Docs: http://{host}:{port}/docs")
-        print()
+        workers_line = "" if reload else f"   Workers: {workers}\n"
+        sys.stdout.write(
+            f"🚀 Starting Document AI Assistant...\n"
+            f"   Host: {host}\n"
+            f"   Port: {port}\n"
+            f"   Debug mode: {reload}\n"
+            f"{workers_line}"
+            f"   API Docs: http://{host}:{port}/docs\n\n"
+        )
+        sys.stdout.flush()
         
         uvicorn.run(
             "app.main:app",
             host=host,
             port=port,
             reload=reload,
-            log_level="debug"
+            # Несколько воркеров несовместимы с автоперезагрузкой
+            workers=1 if reload else workers,
+            log_level=log_level,
+            # Журнал запросов нужен только при разработке
+            access_log=reload or log_level in ("debug", "trace")
         )
         
     except KeyboardInterrupt:
@@ -90,30 +251,33 @@ def main():
                        help='Enable auto-reload for development')
     parser.add_argument('--no-checks', action='store_true',
                        help='Skip dependency checks')
+    parser.add_argument('--log-level', default='info',
+                       choices=['critical', 'error', 'warning', 'info', 'debug', 'trace'],
+                       help='Server log level')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of worker processes (each loads its own models)')
     
     args = parser.parse_args()
     
-    print("=" * 60)
-    print("Document AI Assistant - Server Startup")
-    print("=" * 60)
+    sys.stdout.write(_HEADER)
     
     if not args.no_checks:
         print("Checking dependencies...")
-        if not check_dependencies():
+        if not check_dependencies_cached():
             return 1
         
         check_tesseract()
         print()
     
     # Проверяем существование БД
-    if not os.path.exists("documents.db"):
+    if not DATABASE_READY:
         print("⚠️  Database not found!")
         print("   Run: python init_db.py")
         user_input = input("   Continue anyway? [y/N]: ").strip().lower()
         if user_input != 'y' and user_input != 'yes':
             return 1
     
-    return start_server(args.host, args.port, args.reload)
+    return start_server(args.host, args.port, args.reload, args.workers, args.log_level)
 
 
 if __name__ == "__main__":
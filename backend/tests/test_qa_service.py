@@ -0,0 +1,58 @@
+"""
+Тесты кэша ответов QuestionAnsweringService
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.services import qa as qa_module
+from app.services.qa import QuestionAnsweringService
+
+
+@pytest.fixture
+def qa_service(monkeypatch):
+    service = QuestionAnsweringService()
+    chunks = [{"text": "Контекст документа", "document_id": 1, "chunk_index": 0, "similarity_score": 0.9}]
+    monkeypatch.setattr(
+        qa_module.vector_search_engine, "find_relevant_context", lambda **kwargs: chunks
+    )
+    monkeypatch.setattr(service, "_prepare_context", lambda relevant_chunks: "Контекст документа")
+    monkeypatch.setattr(service, "_format_context_sources", lambda relevant_chunks: [])
+    return service
+
+
+def test_failed_generation_is_retried(qa_service, monkeypatch):
+    """Сбой генерации не попадает в кэш, следующий вызов повторяет генерацию"""
+    calls = []
+    results = [
+        {"answer": "Не удалось сгенерировать ответ на вопрос.", "confidence": 0.0,
+         "tokens_used": 0, "error": "CUDA out of memory"},
+        {"answer": "Ответ из документа", "confidence": 0.8, "tokens_used": 10},
+    ]
+
+    def fake_generate(question, context):
+        calls.append(question)
+        return results[len(calls) - 1]
+
+    monkeypatch.setattr(qa_service, "_generate_answer", fake_generate)
+    version = (1, "created", "updated", "processed")
+
+    first = qa_service.answer_question("Что в документе?", [1], documents_version=version)
+    assert first["error"] == "CUDA out of memory"
+    assert len(qa_service._answer_cache) == 0
+
+    second = qa_service.answer_question("Что в документе?", [1], documents_version=version)
+    assert second["answer"] == "Ответ из документа"
+    assert "error" not in second
+    assert len(calls) == 2
+
+    # Успешный ответ кэшируется
+    third = qa_service.answer_question("Что в документе?", [1], documents_version=version)
+    assert third["answer"] == "Ответ из документа"
+    assert len(calls) == 2
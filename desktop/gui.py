@@ -6,52 +6,367 @@ Document AI Assistant - Desktop GUI Client
 import sys
 import os
 import json
-import base64
-import requests
-import threading
+import httpx
+import sqlite3
+import hashlib
 import time
+from collections import OrderedDict
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple, Sequence, Callable
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QTextEdit, QListWidget, QListWidgetItem,
+    QPushButton, QLabel, QTextEdit, QPlainTextEdit, QListWidget, QListWidgetItem,
     QTabWidget, QFileDialog, QMessageBox, QProgressBar, QSplitter,
-    QGroupBox, QLineEdit, QComboBox, QScrollArea, QFrame,
-    QSystemTrayIcon, QMenu, QDialog, QGridLayout, QSpinBox
+    QGroupBox, QLineEdit, QComboBox, QFrame,
+    QSystemTrayIcon, QMenu, QDialog, QGridLayout
 )
 from PyQt6.QtCore import (
-    Qt, QThread, pyqtSignal, QTimer, QRect, QPoint, QSize, QBuffer
+    Qt, QObject, QRunnable, QThreadPool, pyqtSignal, QTimer, QRect, QRectF, QPoint,
+    QBuffer, QByteArray, QIODevice
 )
 from PyQt6.QtGui import (
-    QFont, QIcon, QPixmap, QAction, QShortcut, QKeySequence,
-    QPainter, QPen, QColor, QCursor
+    QFont, QPixmap, QImage, QAction, QShortcut, QKeySequence,
+    QTextCharFormat, QTextBlockFormat, QTextCursor
 )
 
 
+# Общая таблица стилей приложения: разбирается Qt один раз,
+# виджеты выбираются по objectName
+APP_STYLESHEET = """
+QFrame#documentCard {
+    border: 1px solid #ddd;
+    border-radius: 8px;
+    margin: 5px;
+    padding: 10px;
+    background-color: white;
+}
+
+QLabel#hint {
+    color: #666;
+    font-size: 10px;
+}
+
+QPushButton#summarizeButton {
+    background-color: #4CAF50;
+    color: white;
+    border: none;
+    padding: 8px 16px;
+    border-radius: 4px;
+    font-weight: bold;
+}
+QPushButton#summarizeButton:hover {
+    background-color: #45a049;
+}
+
+QPushButton#questionButton {
+    background-color: #2196F3;
+    color: white;
+    border: none;
+    padding: 8px 16px;
+    border-radius: 4px;
+    font-weight: bold;
+}
+QPushButton#questionButton:hover {
+    background-color: #1976D2;
+}
+
+QPushButton#uploadButton {
+    background-color: #4CAF50;
+    color: white;
+    border: none;
+    padding: 12px;
+    border-radius: 6px;
+    font-size: 14px;
+    font-weight: bold;
+}
+QPushButton#uploadButton:hover {
+    background-color: #45a049;
+}
+
+QPushButton#oneClickSummaryButton {
+    background-color: #FF6B35;
+    color: white;
+    border: none;
+    padding: 15px;
+    border-radius: 8px;
+    font-size: 16px;
+    font-weight: bold;
+}
+QPushButton#oneClickSummaryButton:hover {
+    background-color: #E55A2B;
+}
+QPushButton#oneClickSummaryButton:disabled {
+    background-color: #ccc;
+}
+
+QPushButton#askButton {
+    background-color: #2196F3;
+    color: white;
+    border: none;
+    padding: 10px 20px;
+    border-radius: 4px;
+    font-weight: bold;
+}
+QPushButton#askButton:hover {
+    background-color: #1976D2;
+}
+
+QLabel#instructions {
+    color: #666;
+    padding: 10px;
+    background-color: #f9f9f9;
+    border-radius: 4px;
+}
+
+QPushButton#captureButton {
+    background-color: #9C27B0;
+    color: white;
+    border: none;
+    padding: 15px;
+    border-radius: 8px;
+    font-size: 14px;
+    font-weight: bold;
+}
+QPushButton#captureButton:hover {
+    background-color: #7B1FA2;
+}
+"""
+
+
+class _ProgressFile:
+    """
+    Обертка над файлом для отслеживания прогресса загрузки
+    
+    httpx читает файл для multipart-тела блоками по мере отправки, поэтому
+    прочитанные байты соответствуют отправленным. Колбэк вызывается не чаще
+    ~10 раз в секунду, чтобы не заваливать GUI сигналами
+    """
+    
+    def __init__(self, file, total: int, callback: Callable[[int, int], None], interval: float = 0.1):
+        self._file = file
+        self._total = total
+        self._callback = callback
+        self._interval = interval
+        self._bytes_read = 0
+        self._last_report = 0.0
+    
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file.read(size)
+        self._bytes_read += len(chunk)
+        
+        now = time.monotonic()
+        if not chunk or self._bytes_read >= self._total or now - self._last_report >= self._interval:
+            self._last_report = now
+            self._callback(min(self._bytes_read, self._total), self._total)
+        
+        return chunk
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        position = self._file.seek(offset, whence)
+        self._bytes_read = position
+        return position
+    
+    def tell(self) -> int:
+        return self._file.tell()
+    
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+
+class SummaryCache:
+    """
+    Локальный кэш конспектов на диске
+    
+    Ключ - (адрес сервера, id документа, тип конспекта). Вместе с записью хранится
+    отпечаток документа: после сброса базы сервера id переиспользуются, и запись
+    с другим отпечатком считается промахом, а не чужим конспектом.
+    
+    Повторный просмотр того же конспекта читается из SQLite, а не генерируется
+    сервером заново. При превышении max_size давно открытые записи вытесняются
+    с запасом, до доли EVICT_TARGET от лимита, чтобы не чистить кэш на каждой записи
+    """
+    
+    SCHEMA_VERSION = 2
+    EVICT_TARGET = 0.8
+    
+    def __init__(
+        self,
+        server: str,
+        path: Optional[Path] = None,
+        max_size: int = 100 * 1024 * 1024
+    ):
+        self.server = server
+        self.path = path or Path.home() / ".cache" / "monkeyagent" / "summaries.sqlite"
+        self.max_size = max_size
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        
+        # Освобожденные страницы возвращаются файлу по частям, без полного VACUUM.
+        # Для уже существующего файла режим включается однократным VACUUM
+        if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._conn.execute("VACUUM")
+        
+        # Записи старого формата не привязаны к серверу и документу - отбрасываем их
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS summaries")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "server TEXT, doc_id INTEGER, fingerprint TEXT, stype TEXT, "
+            "body BLOB, ts INTEGER, etag TEXT, "
+            "PRIMARY KEY (server, doc_id, stype))"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def fingerprint(document: Dict) -> str:
+        """Отпечаток документа: имя файла на сервере уникально, время загрузки - тоже"""
+        return f"{document.get('filename')}|{document.get('created_at')}"
+    
+    def get(self, document: Dict, summary_type: str) -> Optional[Dict]:
+        """Закэшированный ответ сервера или None"""
+        key = (self.server, document['id'], summary_type, self.fingerprint(document))
+        row = self._conn.execute(
+            "SELECT body FROM summaries "
+            "WHERE server = ? AND doc_id = ? AND stype = ? AND fingerprint = ?",
+            key
+        ).fetchone()
+        if row is None:
+            return None
+        
+        # Отметка времени обращения нужна для вытеснения по LRU
+        self._conn.execute(
+            "UPDATE summaries SET ts = ? "
+            "WHERE server = ? AND doc_id = ? AND stype = ? AND fingerprint = ?",
+            (time.time_ns(), *key)
+        )
+        self._conn.commit()
+        return json.loads(row[0])
+    
+    def contains(self, document: Dict, summary_type: str) -> bool:
+        """Есть ли конспект в кэше (без обновления времени обращения)"""
+        return self._conn.execute(
+            "SELECT 1 FROM summaries "
+            "WHERE server = ? AND doc_id = ? AND stype = ? AND fingerprint = ?",
+            (self.server, document['id'], summary_type, self.fingerprint(document))
+        ).fetchone() is not None
+    
+    def put(self, document: Dict, summary_type: str, result: Dict, etag: Optional[str] = None):
+        """Сохранение ответа сервера (запись для прежнего документа с тем же id заменяется)"""
+        body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self._conn.execute(
+            "INSERT OR REPLACE INTO summaries "
+            "(server, doc_id, fingerprint, stype, body, ts, etag) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.server, document['id'], self.fingerprint(document), summary_type,
+             body, time.time_ns(), etag)
+        )
+        self._conn.commit()
+        self._evict()
+    
+    def retain(self, documents: List[Dict]):
+        """Удаление конспектов документов этого сервера, которых больше нет в списке"""
+        current = {(doc['id'], self.fingerprint(doc)) for doc in documents}
+        rows = self._conn.execute(
+            "SELECT DISTINCT doc_id, fingerprint FROM summaries WHERE server = ?",
+            (self.server,)
+        ).fetchall()
+        
+        stale = [(self.server, doc_id) for doc_id, fingerprint in rows if (doc_id, fingerprint) not in current]
+        if stale:
+            self._conn.executemany("DELETE FROM summaries WHERE server = ? AND doc_id = ?", stale)
+            self._conn.commit()
+    
+    def _evict(self):
+        """Удаление самых старых записей при превышении лимита (до EVICT_TARGET от него)"""
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_size:
+            return
+        
+        target = int(self.max_size * self.EVICT_TARGET)
+        rows = self._conn.execute(
+            "SELECT server, doc_id, stype, LENGTH(body) FROM summaries ORDER BY ts"
+        ).fetchall()
+        for server, doc_id, stype, size in rows:
+            if total <= target:
+                break
+            self._conn.execute(
+                "DELETE FROM summaries WHERE server = ? AND doc_id = ? AND stype = ?",
+                (server, doc_id, stype)
+            )
+            total -= size
+        
+        self._conn.commit()
+        # Возвращаем освободившееся место файлу (без перезаписи всей базы).
+        # Через executescript: execute выполняет прагму только на одну страницу
+        self._conn.executescript("PRAGMA incremental_vacuum;")
+    
+    def close(self):
+        self._conn.close()
+
+
 class APIClient:
     """Клиент для взаимодействия с FastAPI backend"""
     
     def __init__(self, base_url: str = "http://127.0.0.1:8000"):
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.timeout = 30
+        # Пул keep-alive соединений, общий для всех запросов к серверу.
+        # Конспектирование и поиск ответа идут долго, поэтому таймаут чтения больше.
+        # Неудачные попытки соединения повторяются транспортом, чтобы кратковременный
+        # сбой не доходил до интерфейса
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=httpx.Timeout(30.0, read=300.0),
+            transport=httpx.HTTPTransport(
+                retries=2,
+                limits=httpx.Limits(
+                    max_keepalive_connections=8,
+                    max_connections=16,
+                    keepalive_expiry=60
+                )
+            )
+        )
     
-    def check_health(self) -> bool:
+        # Последний полученный список документов и его ETag для условных запросов
+        self._docs_etag = None
+        self._docs_cache = []
+        self.documents_total = 0  # всего документов на сервере (список может быть страницей)
+    
+    def close(self):
+        """Закрытие соединений с сервером"""
+        self._client.close()
+    
+    def check_health(self, timeout: Optional[float] = None) -> bool:
         """Проверка доступности API"""
         try:
-            response = self.session.get(f"{self.base_url}/health")
+            if timeout is None:
+                response = self._client.get("/health")
+            else:
+                response = self._client.get("/health", timeout=timeout)
             return response.status_code == 200
         except:
             return False
     
-    def upload_document(self, file_path: str) -> Optional[Dict]:
-        """Загрузка документа"""
+    def upload_document(
+        self,
+        file_path: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Optional[Dict]:
+        """Загрузка документа (файл отправляется потоком, не читаясь в память целиком)"""
         try:
             with open(file_path, 'rb') as f:
-                files = {'file': (Path(file_path).name, f)}
-                response = self.session.post(
-                    f"{self.base_url}/api/v1/documents/upload",
+                upload_file = f
+                if progress_callback:
+                    upload_file = _ProgressFile(f, os.fstat(f.fileno()).st_size, progress_callback)
+                
+                files = {'file': (Path(file_path).name, upload_file)}
+                response = self._client.post(
+                    "/api/v1/documents/upload",
                     files=files
                 )
             
@@ -63,19 +378,34 @@ class APIClient:
             return {"error": str(e)}
     
     def get_documents(self) -> List[Dict]:
-        """Получение списка документов"""
-        try:
-            response = self.session.get(f"{self.base_url}/api/v1/documents/")
-            if response.status_code == 200:
-                return response.json().get("documents", [])
-            return []
-        except:
-            return []
+        """
+        Получение списка документов
+        
+        Сетевые ошибки не перехватываются: по ним вызывающий код увеличивает
+        интервал опроса сервера
+        """
+        headers = {"If-None-Match": self._docs_etag} if self._docs_etag else {}
+        response = self._client.get("/api/v1/documents/", headers=headers)
+        
+        # Список не изменился - возвращаем тот же объект, что и в прошлый раз
+        if response.status_code == 304:
+            return self._docs_cache
+        
+        if response.status_code == 200:
+            data = response.json()
+            self._docs_etag = response.headers.get("ETag")
+            self._docs_cache = data.get("documents", [])
+            self.documents_total = data.get("total", len(self._docs_cache))
+            return self._docs_cache
+        
+        # Ошибку сервера не выдаем за пустой список
+        response.raise_for_status()
+        return []
     
     def get_document(self, document_id: int) -> Optional[Dict]:
         """Получение документа по ID"""
         try:
-            response = self.session.get(f"{self.base_url}/api/v1/documents/{document_id}")
+            response = self._client.get(f"/api/v1/documents/{document_id}")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -89,8 +419,8 @@ class APIClient:
                 "document_id": document_id,
                 "summary_type": summary_type
             }
-            response = self.session.post(
-                f"{self.base_url}/api/v1/documents/{document_id}/summarize",
+            response = self._client.post(
+                f"/api/v1/documents/{document_id}/summarize",
                 json=payload
             )
             
@@ -101,6 +431,35 @@ class APIClient:
         except Exception as e:
             return {"error": str(e)}
     
+    def prefetch_summaries(
+        self,
+        document_ids: List[int],
+        summary_type: str = "brief",
+        max_concurrency: int = 3
+    ) -> Dict[int, Dict]:
+        """
+        Параллельное получение конспектов нескольких документов
+        
+        Запросы идут одновременно через общий пул соединений, поэтому общее время
+        определяется самым долгим запросом, а не их суммой
+        
+        Returns:
+            Dict[int, Dict]: успешные ответы сервера по id документа
+        """
+        if not document_ids:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(document_ids))) as executor:
+            results = executor.map(
+                lambda document_id: self.summarize_document(document_id, summary_type),
+                document_ids
+            )
+            return {
+                document_id: result
+                for document_id, result in zip(document_ids, results)
+                if result and "error" not in result
+            }
+    
     def ask_question(self, document_ids: List[int], question: str) -> Optional[Dict]:
         """Задать вопрос по документам"""
         try:
@@ -108,8 +467,8 @@ class APIClient:
                 "document_ids": document_ids,
                 "question": question
             }
-            response = self.session.post(
-                f"{self.base_url}/api/v1/documents/question",
+            response = self._client.post(
+                "/api/v1/documents/question",
                 json=payload
             )
             
@@ -120,13 +479,36 @@ class APIClient:
         except Exception as e:
             return {"error": str(e)}
     
-    def ocr_image(self, image_data: str) -> Optional[Dict]:
-        """OCR изображения"""
+    def ocr_image_bytes(self, png: bytes) -> Optional[Dict]:
+        """OCR изображения: PNG отправляется телом запроса, без multipart-обертки"""
         try:
-            payload = {"image_data": image_data}
-            response = self.session.post(
-                f"{self.base_url}/api/v1/documents/ocr",
-                json=payload
+            response = self._client.post(
+                "/api/v1/documents/ocr/raw",
+                content=png,
+                headers={"Content-Type": "image/png"}
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": response.text}
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def ocr_and_answer(self, png: bytes, document_ids: List[int]) -> Optional[Dict]:
+        """
+        OCR изображения и поиск ответа на распознанный текст одним запросом
+        
+        Returns:
+            Dict: {"ocr": результат OCR, "answer": ответ или None,
+                   "answer_error": причина отсутствия ответа} либо {"error": ...}
+        """
+        try:
+            response = self._client.post(
+                "/api/v1/documents/ocr/question",
+                content=png,
+                params={"document_ids": document_ids},
+                headers={"Content-Type": "image/png"}
             )
             
             if response.status_code == 200:
@@ -145,25 +527,97 @@ class ScreenCaptureWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
-        self.setWindowState(Qt.WindowState.WindowFullScreen)
         self.setMouseTracking(True)
         
-        # Получаем скриншот экрана
-        screen = QApplication.primaryScreen()
-        self.screenshot = screen.grabWindow(0)
+        # Скриншот снимается при показе виджета, а не при создании
+        self.screenshot = None
+        self._dimmed_screenshot = None
+        self.capture_screen = None
+        
+        self.begin = QPoint()
+        self.end = QPoint()
+        self.drawing = False
+        
+        # Накопленная область перерисовки и флаг запланированного обновления
+        self._dirty_rect = QRect()
+        self._update_pending = False
+    
+    def show_on_screen(self, screen):
+        """
+        Показ виджета на весь указанный экран
+        
+        Экран назначается до перехода в полноэкранный режим: уже развернутое
+        окно Qt на другой монитор через setGeometry не переносит
+        """
+        self.capture_screen = screen
+        if self.windowHandle() is not None:
+            self.windowHandle().setScreen(screen)
+        self.setGeometry(screen.geometry())
+        self.showFullScreen()
+    
+    def showEvent(self, event):
+        # Классы рисования нужны только при захвате экрана - импортируем при первом использовании
+        from PyQt6.QtGui import QPainter, QColor
         
+        # Начинаем новое выделение при каждом показе
         self.begin = QPoint()
         self.end = QPoint()
         self.drawing = False
+        
+        # Снимаем экран, на котором показан виджет
+        if self.capture_screen is None:
+            self.capture_screen = QApplication.primaryScreen()
+        self.screenshot = self.capture_screen.grabWindow(0)
+        
+        # Затемненную копию готовим один раз, а не при каждой перерисовке
+        self._dimmed_screenshot = QPixmap(self.screenshot)
+        painter = QPainter(self._dimmed_screenshot)
+        painter.fillRect(self._dimmed_screenshot.rect(), QColor(0, 0, 0, 100))
+        painter.end()
+        
+        super().showEvent(event)
+    
+    def selection_pixmap(self, selection_rect: QRect) -> QPixmap:
+        """
+        Выделенная область из скриншота, снятого при показе виджета
+        
+        Скриншот хранится в физических пикселях, а выделение задано в логических,
+        поэтому координаты масштабируются (актуально для HiDPI экранов)
+        """
+        scale_x = self.screenshot.width() / max(1, self.width())
+        scale_y = self.screenshot.height() / max(1, self.height())
+        return self.screenshot.copy(QRect(
+            round(selection_rect.x() * scale_x),
+            round(selection_rect.y() * scale_y),
+            round(selection_rect.width() * scale_x),
+            round(selection_rect.height() * scale_y)
+        ))
+    
+    def hideEvent(self, event):
+        # Виджет переиспользуется, поэтому скриншоты экрана между захватами не держим
+        self.screenshot = None
+        self._dimmed_screenshot = None
+        super().hideEvent(event)
     
     def paintEvent(self, event):
-        painter = QPainter(self)
+        if self.screenshot is None:
+            return
         
-        # Рисуем затемненный скриншот
-        painter.drawPixmap(self.rect(), self.screenshot, self.screenshot.rect())
+        from PyQt6.QtGui import QPainter, QPen, QColor
         
-        # Затемняем весь экран
-        painter.fillRect(self.rect(), QColor(0, 0, 0, 100))
+        painter = QPainter(self)
+        
+        # Рисуем затемненный скриншот только в области, которую нужно обновить
+        dirty_rect = event.rect()
+        scale_x = self._dimmed_screenshot.width() / max(1, self.width())
+        scale_y = self._dimmed_screenshot.height() / max(1, self.height())
+        source_rect = QRectF(
+            dirty_rect.x() * scale_x,
+            dirty_rect.y() * scale_y,
+            dirty_rect.width() * scale_x,
+            dirty_rect.height() * scale_y
+        )
+        painter.drawPixmap(QRectF(dirty_rect), self._dimmed_screenshot, source_rect)
         
         # Если выделяем область, показываем ее без затемнения
         if self.drawing and not self.begin.isNull() and not self.end.isNull():
@@ -184,8 +638,25 @@ class ScreenCaptureWidget(QWidget):
     
     def mouseMoveEvent(self, event):
         if self.drawing:
+            previous_rect = QRect(self.begin, self.end).normalized()
             self.end = event.position().toPoint()
-            self.update()
+            current_rect = QRect(self.begin, self.end).normalized()
+            
+            # Перерисовываем только старое и новое выделение (с запасом на рамку)
+            self._dirty_rect = self._dirty_rect.united(
+                previous_rect.united(current_rect).adjusted(-2, -2, 2, 2)
+            )
+            
+            # Не чаще ~60 раз в секунду
+            if not self._update_pending:
+                self._update_pending = True
+                QTimer.singleShot(16, self._flush_update)
+    
+    def _flush_update(self):
+        """Перерисовка накопленной области выделения"""
+        self._update_pending = False
+        self.update(self._dirty_rect)
+        self._dirty_rect = QRect()
     
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.drawing:
@@ -204,25 +675,32 @@ class ScreenCaptureWidget(QWidget):
             self.close()
 
 
-class WorkerThread(QThread):
-    """Поток для выполнения длительных операций"""
+class _JobSignals(QObject):
+    """Сигналы фоновой задачи (QRunnable сам не может их объявлять)"""
     
-    progress = pyqtSignal(str)
-    finished = pyqtSignal(dict)
-    error = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(object)  # исключение; в текст форматируется только при показе
+    done = pyqtSignal()
+
+
+class _Job(QRunnable):
+    """Длительная операция, выполняемая в общем пуле потоков"""
     
     def __init__(self, operation, *args, **kwargs):
         super().__init__()
         self.operation = operation
         self.args = args
         self.kwargs = kwargs
+        self.signals = _JobSignals()
     
     def run(self):
         try:
             result = self.operation(*self.args, **self.kwargs)
-            self.finished.emit(result or {})
+            self.signals.finished.emit(result or {})
         except Exception as e:
-            self.error.emit(str(e))
+            self.signals.error.emit(e)
+        finally:
+            self.signals.done.emit()
 
 
 class DocumentWidget(QFrame):
@@ -238,15 +716,7 @@ class DocumentWidget(QFrame):
     
     def setup_ui(self):
         self.setFrameStyle(QFrame.Shape.Box)
-        self.setStyleSheet("""
-            QFrame {
-                border: 1px solid #ddd;
-                border-radius: 8px;
-                margin: 5px;
-                padding: 10px;
-                background-color: white;
-            }
-        """)
+        self.setObjectName("documentCard")
         
         layout = QVBoxLayout(self)
         
@@ -263,7 +733,7 @@ class DocumentWidget(QFrame):
         """
         
         info_label = QLabel(info_text)
-        info_label.setStyleSheet("color: #666; font-size: 10px;")
+        info_label.setObjectName("hint")
         layout.addWidget(info_label)
         
         # Кнопки действий
@@ -271,37 +741,13 @@ class DocumentWidget(QFrame):
         
         # Кнопка конспектирования
         summarize_btn = QPushButton("📝 Законспектировать")
-        summarize_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-        """)
+        summarize_btn.setObjectName("summarizeButton")
         summarize_btn.clicked.connect(self.on_summarize_clicked)
         buttons_layout.addWidget(summarize_btn)
         
         # Кнопка для вопросов
         question_btn = QPushButton("❓ Задать вопрос")
-        question_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #1976D2;
-            }
-        """)
+        question_btn.setObjectName("questionButton")
         question_btn.clicked.connect(self.on_question_clicked)
         buttons_layout.addWidget(question_btn)
         
@@ -323,22 +769,79 @@ class DocumentWidget(QFrame):
 class MainWindow(QMainWindow):
     """Главное окно приложения"""
     
-    def __init__(self):
+    # Прогресс загрузки документа: (отправлено байт, всего байт)
+    upload_progress_changed = pyqtSignal(int, int)
+    
+    # С какого размера (в физических пикселях) захват с HiDPI экрана уменьшается перед OCR
+    OCR_DOWNSCALE_MIN_PIXELS = 1920 * 1080
+    
+    # Виды задач, которые идут в фоне и не означают, что пользователь ждет ответа
+    BACKGROUND_JOB_KINDS = ("refresh", "prefetch")
+    
+    def __init__(self, api_client: Optional[APIClient] = None):
         super().__init__()
-        self.api_client = APIClient()
-        self.current_documents = []
+        self.api_client = api_client or APIClient()
+        self.summary_cache = SummaryCache(self.api_client.base_url)
+        
+        # Форматы текста конспекта: создаются один раз и используются при каждом показе
+        self._fmt_title = QTextCharFormat()
+        self._fmt_title.setFontWeight(QFont.Weight.Bold)
+        self._fmt_title.setFontPointSize(14)
+        self._fmt_label = QTextCharFormat()
+        self._fmt_label.setFontWeight(QFont.Weight.Bold)
+        self._fmt_body = QTextCharFormat()
+        self._fmt_body.setFontPointSize(11)
+        self._block_body = QTextBlockFormat()
+        self._block_body.setLineHeight(160, QTextBlockFormat.LineHeightTypes.ProportionalHeight.value)
+        QApplication.instance().setStyleSheet(APP_STYLESHEET)
+        
+        self.current_documents = []  # от новых к старым
+        self._completed_docs: List[Dict] = []  # обработанные документы в том же порядке
+        self._completed_doc_ids: Tuple[int, ...] = ()  # их id для запросов ответа (только чтение)
+        self._item_by_id: Dict[int, QListWidgetItem] = {}  # элементы списка по id документа
         self.capture_widget = None
+        self._prefetched_ids = set()  # документы, для которых уже запрашивали конспект заранее
+        self._ocr_cache: Dict[str, Dict] = {}  # результаты OCR по хэшу PNG за время сеанса
+        self._auto_question_after_ocr = False  # задать вопрос сразу после распознавания
+        
+        # Буфер для PNG захваченной области: один на все захваты, с запасом под 4 МБ
+        self._png_buf = QByteArray()
+        self._png_buf.reserve(4 * 1024 * 1024)
+        self._png_dev = QBuffer(self._png_buf)
+        self._png_dev.open(QIODevice.OpenModeFlag.ReadWrite)
+        self._error_dialog_cooldown = 0.0  # время последнего диалога об ошибке
+        
+        # Основной экран запоминаем, обновляя только при его смене
+        self._primary_screen = QApplication.primaryScreen()
+        QApplication.instance().primaryScreenChanged.connect(self._on_primary_screen_changed)
+        
+        # Защита от повторной отправки вопроса и кэш ответов за время сеанса
+        self._qa_in_flight = False
+        self._qa_last_ts = 0.0
+        self._qa_cache: OrderedDict = OrderedDict()
+        self._qa_cache_size = 64
+        
+        # Номера последних запросов OCR и ответа: результаты более ранних отбрасываются
+        self._ocr_gen = 0
+        self._qa_gen = 0
+        
+        # Общий пул потоков для запросов к серверу вместо отдельного QThread на каждый
+        self.thread_pool = QThreadPool.globalInstance()
+        self.thread_pool.setMaxThreadCount(4)
+        self._exclusive_jobs: Dict[str, _Job] = {}  # задачи, которые не запускаются повторно
+        self._running_jobs = set()  # держим ссылки, пока задачи не завершатся
         
         self.setup_ui()
+        self._statusbar = self.statusBar()  # используется всеми show_* методами
         self.setup_shortcuts()
         self.setup_system_tray()
         
-        # Таймер для проверки статуса документов
+        # Таймер для проверки статуса документов (каждые 5 секунд).
+        # Работает только пока окно видно: запускается в showEvent, останавливается в hideEvent
         self.status_timer = QTimer()
+        self.status_timer.setInterval(5000)
         self.status_timer.timeout.connect(self.refresh_documents)
-        self.status_timer.start(5000)  # каждые 5 секунд
-        
-        self.refresh_documents()
+        self._refresh_failures = 0  # неудачные опросы подряд, для увеличения интервала
     
     def setup_ui(self):
         """Настройка пользовательского интерфейса"""
@@ -377,23 +880,16 @@ class MainWindow(QMainWindow):
         
         # Кнопка загрузки
         upload_btn = QPushButton("📁 Загрузить документ")
-        upload_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 12px;
-                border-radius: 6px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-        """)
+        upload_btn.setObjectName("uploadButton")
         upload_btn.clicked.connect(self.upload_document)
         left_layout.addWidget(upload_btn)
         
+        # Прогресс загрузки документа
+        self.upload_progress = QProgressBar()
+        self.upload_progress.setVisible(False)
+        left_layout.addWidget(self.upload_progress)
+        self.upload_progress_changed.connect(self.on_upload_progress)
+        
         # Список документов
         self.documents_list = QListWidget()
         self.documents_list.itemClicked.connect(self.on_document_selected)
@@ -406,7 +902,7 @@ class MainWindow(QMainWindow):
         
         # Статистика
         self.stats_label = QLabel("Статистика загружается...")
-        self.stats_label.setStyleSheet("color: #666; font-size: 10px;")
+        self.stats_label.setObjectName("hint")
         left_layout.addWidget(self.stats_label)
         
         parent.addWidget(left_panel)
@@ -452,23 +948,7 @@ class MainWindow(QMainWindow):
         
         # Кнопка "Законспектировать в один клик"
         self.one_click_summary_btn = QPushButton("✨ Законспектировать в один клик")
-        self.one_click_summary_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #FF6B35;
-                color: white;
-                border: none;
-                padding: 15px;
-                border-radius: 8px;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #E55A2B;
-            }
-            QPushButton:disabled {
-                background-color: #ccc;
-            }
-        """)
+        self.one_click_summary_btn.setObjectName("oneClickSummaryButton")
         self.one_click_summary_btn.clicked.connect(self.one_click_summarize)
         self.one_click_summary_btn.setEnabled(False)
         controls_layout.addWidget(self.one_click_summary_btn, 1, 0, 1, 2)
@@ -502,6 +982,8 @@ class MainWindow(QMainWindow):
         self.qa_history = QTextEdit()
         self.qa_history.setPlaceholderText("История вопросов и ответов...")
         self.qa_history.setReadOnly(True)
+        # Старые записи истории отбрасываются автоматически
+        self.qa_history.document().setMaximumBlockCount(500)
         layout.addWidget(self.qa_history)
         
         # Ввод вопроса
@@ -515,22 +997,10 @@ class MainWindow(QMainWindow):
         
         question_buttons = QHBoxLayout()
         
-        ask_btn = QPushButton("🔍 Найти ответ")
-        ask_btn.clicked.connect(self.ask_question)
-        ask_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                border: none;
-                padding: 10px 20px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #1976D2;
-            }
-        """)
-        question_buttons.addWidget(ask_btn)
+        self.ask_btn = QPushButton("🔍 Найти ответ")
+        self.ask_btn.clicked.connect(self.ask_question)
+        self.ask_btn.setObjectName("askButton")
+        question_buttons.addWidget(self.ask_btn)
         
         clear_btn = QPushButton("🗑️ Очистить")
         clear_btn.clicked.connect(lambda: self.qa_history.clear())
@@ -564,25 +1034,12 @@ class MainWindow(QMainWindow):
         
         <i>Выделите область с текстом на экране, и AI найдет ответ в ваших документах!</i>
         """)
-        instructions.setStyleSheet("color: #666; padding: 10px; background-color: #f9f9f9; border-radius: 4px;")
+        instructions.setObjectName("instructions")
         layout.addWidget(instructions)
         
         # Кнопка выделения области
         capture_btn = QPushButton("📷 Выделить область экрана")
-        capture_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #9C27B0;
-                color: white;
-                border: none;
-                padding: 15px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #7B1FA2;
-            }
-        """)
+        capture_btn.setObjectName("captureButton")
         capture_btn.clicked.connect(self.capture_screen_area)
         layout.addWidget(capture_btn)
         
@@ -590,8 +1047,16 @@ class MainWindow(QMainWindow):
         ocr_group = QGroupBox("Распознанный текст")
         ocr_group_layout = QVBoxLayout(ocr_group)
         
-        self.ocr_result = QTextEdit()
+        # Уверенность и время распознавания - отдельной строкой над текстом
+        self.ocr_info = QLabel()
+        self.ocr_info.setObjectName("hint")
+        self.ocr_info.setVisible(False)
+        ocr_group_layout.addWidget(self.ocr_info)
+        
+        # Распознанный текст выводится как есть, без HTML-разметки
+        self.ocr_result = QPlainTextEdit()
         self.ocr_result.setPlaceholderText("Распознанный текст будет отображаться здесь...")
+        self.ocr_result.setFont(QFont("monospace"))
         ocr_group_layout.addWidget(self.ocr_result)
         
         # Кнопка для поиска ответа по OCR тексту
@@ -652,6 +1117,42 @@ class MainWindow(QMainWindow):
             self.raise_()
             self.activateWindow()
     
+    def _start_job(self, operation, on_finished, on_error=None, kind: Optional[str] = None) -> bool:
+        """
+        Запуск операции в пуле потоков
+        
+        Если указан kind и задача этого вида еще выполняется, новая не запускается
+        
+        Returns:
+            bool: была ли задача запущена
+        """
+        if kind is not None and kind in self._exclusive_jobs:
+            return False
+        
+        job = _Job(operation)
+        job.signals.finished.connect(on_finished)
+        if on_error is not None:
+            job.signals.error.connect(on_error)
+        job.signals.done.connect(lambda: self._on_job_done(job, kind))
+        
+        if kind is not None:
+            self._exclusive_jobs[kind] = job
+        self._running_jobs.add(job)
+        
+        self.thread_pool.start(job)
+        return True
+    
+    def _interactive_job_running(self) -> bool:
+        """Выполняется ли запрос пользователя (любая задача, кроме фоновых видов)"""
+        background = sum(1 for kind in self.BACKGROUND_JOB_KINDS if kind in self._exclusive_jobs)
+        return len(self._running_jobs) > background
+    
+    def _on_job_done(self, job: _Job, kind: Optional[str]):
+        """Освобождение завершенной задачи"""
+        self._running_jobs.discard(job)
+        if kind is not None and self._exclusive_jobs.get(kind) is job:
+            del self._exclusive_jobs[kind]
+    
     def upload_document(self):
         """Загрузка документа"""
         file_path, _ = QFileDialog.getOpenFileName(
@@ -667,17 +1168,24 @@ class MainWindow(QMainWindow):
     def upload_document_async(self, file_path: str):
         """Асинхронная загрузка документа"""
         self.show_status("Загрузка документа...")
+        self.upload_progress.setRange(0, 100)
+        self.upload_progress.setValue(0)
+        self.upload_progress.setVisible(True)
         
         def upload_operation():
-            return self.api_client.upload_document(file_path)
+            # Сигнал из рабочего потока доставляется в GUI поток через очередь событий
+            return self.api_client.upload_document(file_path, self.upload_progress_changed.emit)
         
-        self.worker = WorkerThread(upload_operation)
-        self.worker.finished.connect(self.on_upload_finished)
-        self.worker.error.connect(self.on_operation_error)
-        self.worker.start()
+        self._start_job(upload_operation, self.on_upload_finished, self.on_operation_error)
+    
+    def on_upload_progress(self, sent: int, total: int):
+        """Обновление прогресса загрузки документа"""
+        if total > 0:
+            self.upload_progress.setValue(sent * 100 // total)
     
     def on_upload_finished(self, result: Dict):
         """Обработчик завершения загрузки"""
+        self.upload_progress.setVisible(False)
         if "error" in result:
             self.show_error(f"Ошибка загрузки: {result['error']}")
         else:
@@ -686,48 +1194,153 @@ class MainWindow(QMainWindow):
     
     def refresh_documents(self):
         """Обновление списка документов"""
+        self._update_refresh_interval()
+        
         def get_documents():
             return self.api_client.get_documents()
         
-        self.worker = WorkerThread(get_documents)
-        self.worker.finished.connect(self.on_documents_loaded)
-        self.worker.start()
+        # Пока предыдущий запрос списка не завершился, новый не ставим в очередь
+        self._start_job(get_documents, self.on_documents_loaded, self.on_refresh_error, kind="refresh")
+    
+    def _update_refresh_interval(self):
+        """
+        Интервал опроса сервера
+        
+        При недоступном сервере интервал удваивается после каждой ошибки,
+        но не больше минуты
+        """
+        self.status_timer.setInterval(min(60000, 5000 << min(self._refresh_failures, 4)))
+    
+    def on_refresh_error(self, error: Exception):
+        """Сервер недоступен - откладываем следующий опрос"""
+        self._refresh_failures += 1
+        self._update_refresh_interval()
     
     def on_documents_loaded(self, documents: List[Dict]):
         """Обработчик загрузки списка документов"""
+        if self._refresh_failures:
+            self._refresh_failures = 0
+            self._update_refresh_interval()
+        
+        # Сервер ответил 304 - список тот же, перестраивать виджеты не нужно
+        if documents is self.current_documents:
+            return
+        
         self.current_documents = documents if isinstance(documents, list) else []
+        
+        # Упорядочиваем и фильтруем список один раз, дальше все используют готовый
+        # (сервер уже отдает новые первыми, так что сортировка обходится в один проход)
+        self.current_documents.sort(key=itemgetter('created_at'), reverse=True)
+        self._completed_docs = [
+            d for d in self.current_documents if d.get('processing_status') == 'completed'
+        ]
+        self._completed_doc_ids = tuple(d['id'] for d in self._completed_docs)
+        
         self.update_documents_list()
         self.update_stats()
+        
+        # Конспекты удаленных документов больше не нужны. Список может быть неполным
+        # (сервер отдает его страницами), тогда ничего не удаляем
+        if len(self.current_documents) >= self.api_client.documents_total:
+            self.summary_cache.retain(self.current_documents)
+        
+        self.prefetch_summaries()
+    
+    def prefetch_summaries(self, count: int = 1, summary_type: str = "brief"):
+        """
+        Фоновая загрузка кратких конспектов последних обработанных документов
+        
+        Сервер выполняет генерацию по одной, поэтому заранее запрашиваем только
+        самый новый документ и только когда пользователь ничего не ждет: иначе его
+        вопрос или конспект встал бы в очередь за фоновой генерацией
+        """
+        if self._interactive_job_running():
+            return
+        
+        documents = {
+            doc['id']: doc for doc in self._completed_docs[:count]
+            if doc['id'] not in self._prefetched_ids
+            and not self.summary_cache.contains(doc, summary_type)
+        }
+        if not documents:
+            return
+        document_ids = list(documents)
+        
+        def prefetch_operation():
+            return self.api_client.prefetch_summaries(document_ids, summary_type)
+        
+        def on_prefetched(results: Dict[int, Dict]):
+            for document_id, result in results.items():
+                self.summary_cache.put(documents[document_id], summary_type, result)
+        
+        if self._start_job(prefetch_operation, on_prefetched, kind="prefetch"):
+            # Каждый документ запрашиваем не более одного раза за сеанс, даже при ошибке
+            self._prefetched_ids.update(document_ids)
+    
+    @staticmethod
+    def _document_item_text(doc: Dict) -> str:
+        """Текст элемента списка документов"""
+        item_text = f"📄 {doc.get('original_filename', 'Unknown')}"
+        status = doc.get('processing_status', 'unknown')
+        
+        if status == 'completed':
+            item_text += " ✅"
+        elif status == 'processing':
+            item_text += " ⏳"
+        elif status == 'failed':
+            item_text += " ❌"
+        else:
+            item_text += " ⏸️"
+        
+        return item_text
     
     def update_documents_list(self):
-        """Обновление отображения списка документов"""
-        self.documents_list.clear()
+        """
+        Обновление отображения списка документов
         
-        for doc in self.current_documents:
-            item_text = f"📄 {doc.get('original_filename', 'Unknown')}"
-            status = doc.get('processing_status', 'unknown')
+        Элементы сопоставляются по id документа: удаляются пропавшие, добавляются
+        новые и обновляются изменившиеся, остальные виджеты не пересоздаются
+        """
+        documents_by_id = {doc.get('id'): doc for doc in self.current_documents}
+        current_item = self.documents_list.currentItem()
+        
+        # Удаляем документы, которых больше нет
+        for row in reversed(range(self.documents_list.count())):
+            doc_id = self.documents_list.item(row).data(Qt.ItemDataRole.UserRole).get('id')
+            if doc_id not in documents_by_id:
+                self.documents_list.takeItem(row)
+                self._item_by_id.pop(doc_id, None)
+        
+        # Добавляем новые и обновляем изменившиеся, сохраняя порядок от новых к старым
+        for row, doc in enumerate(self.current_documents):
+            item = self._item_by_id.get(doc.get('id'))
             
-            if status == 'completed':
-                item_text += " ✅"
-            elif status == 'processing':
-                item_text += " ⏳"
-            elif status == 'failed':
-                item_text += " ❌"
-            else:
-                item_text += " ⏸️"
+            if item is None:
+                item = QListWidgetItem(self._document_item_text(doc))
+                item.setData(Qt.ItemDataRole.UserRole, doc)
+                self.documents_list.insertItem(row, item)
+                self._item_by_id[doc.get('id')] = item
+                continue
+            
+            if item.data(Qt.ItemDataRole.UserRole) != doc:
+                item.setText(self._document_item_text(doc))
+                item.setData(Qt.ItemDataRole.UserRole, doc)
             
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.ItemDataRole.UserRole, doc)
-            self.documents_list.addItem(item)
+            current_row = self.documents_list.row(item)
+            if current_row != row:
+                self.documents_list.insertItem(row, self.documents_list.takeItem(current_row))
+        
+        # Восстанавливаем выбранный документ, если он остался в списке
+        if current_item is not None and self.documents_list.row(current_item) >= 0:
+            self.documents_list.setCurrentItem(current_item)
         
         # Обновляем доступность кнопки "один клик"
-        completed_docs = [d for d in self.current_documents if d.get('processing_status') == 'completed']
-        self.one_click_summary_btn.setEnabled(len(completed_docs) > 0)
+        self.one_click_summary_btn.setEnabled(bool(self._completed_docs))
     
     def update_stats(self):
         """Обновление статистики"""
         total = len(self.current_documents)
-        completed = len([d for d in self.current_documents if d.get('processing_status') == 'completed'])
+        completed = len(self._completed_docs)
         processing = len([d for d in self.current_documents if d.get('processing_status') == 'processing'])
         
         stats_text = f"Всего: {total} | Обработано: {completed} | Обрабатывается: {processing}"
@@ -741,48 +1354,65 @@ class MainWindow(QMainWindow):
     
     def show_document_info(self, document: Dict):
         """Отображение информации о документе"""
-        info_text = f"""
-        <h3>📄 {document.get('original_filename', 'Неизвестный документ')}</h3>
-        
-        <b>Информация:</b><br>
-        • ID: {document.get('id')}<br>
-        • Размер: {document.get('file_size', 0) // 1024} KB<br>
-        • Тип: {document.get('file_type', 'unknown').upper()}<br>
-        • Страниц: {document.get('page_count', 'N/A')}<br>
-        • Статус: {document.get('processing_status', 'unknown')}<br>
-        • Загружен: {document.get('created_at', 'N/A')[:19]}<br>
-        """
+        parts = [
+            f"<h3>📄 {document.get('original_filename', 'Неизвестный документ')}</h3>",
+            "<b>Информация:</b><br>",
+            f"• ID: {document.get('id')}<br>",
+            f"• Размер: {document.get('file_size', 0) // 1024} KB<br>",
+            f"• Тип: {document.get('file_type', 'unknown').upper()}<br>",
+            f"• Страниц: {document.get('page_count', 'N/A')}<br>",
+            f"• Статус: {document.get('processing_status', 'unknown')}<br>",
+            f"• Загружен: {document.get('created_at', 'N/A')[:19]}<br>",
+        ]
         
         if document.get('processing_status') == 'failed':
-            info_text += f"<br><b style='color: red;'>Ошибка:</b> {document.get('error_message', 'Неизвестная ошибка')}"
+            parts.append(
+                f"<br><b style='color: red;'>Ошибка:</b> {document.get('error_message', 'Неизвестная ошибка')}"
+            )
         
         # Показываем информацию в области конспектов (временно)
-        self.summary_display.setHtml(info_text)
+        self.summary_display.setHtml("".join(parts))
     
     def one_click_summarize(self):
         """Конспектирование в один клик для всех обработанных документов"""
-        completed_docs = [d for d in self.current_documents if d.get('processing_status') == 'completed']
-        
-        if not completed_docs:
+        if not self._completed_docs:
             self.show_error("Нет обработанных документов для конспектирования")
             return
         
-        # Берем последний загруженный документ
-        latest_doc = max(completed_docs, key=lambda x: x.get('created_at', ''))
+        # Берем последний загруженный документ (список упорядочен от новых к старым)
+        latest_doc = self._completed_docs[0]
         
         self.summarize_document_async(latest_doc['id'], self.summary_type_combo.currentText())
     
     def summarize_document_async(self, document_id: int, summary_type: str):
         """Асинхронное создание конспекта"""
-        self.show_progress("Создание конспекта...", self.summary_progress)
+        item = self._item_by_id.get(document_id)
+        document = item.data(Qt.ItemDataRole.UserRole) if item is not None else None
+        
+        # Этот конспект уже получали - показываем его без запроса к серверу
+        cached = self.summary_cache.get(document, summary_type) if document else None
+        if cached is not None:
+            QTimer.singleShot(0, lambda: self.on_summarize_finished(cached))
+            return
         
         def summarize_operation():
             return self.api_client.summarize_document(document_id, summary_type)
         
-        self.worker = WorkerThread(summarize_operation)
-        self.worker.finished.connect(self.on_summarize_finished)
-        self.worker.error.connect(self.on_operation_error)
-        self.worker.start()
+        def on_finished(result: Dict):
+            if "error" not in result and document:
+                self.summary_cache.put(document, summary_type, result)
+            self.on_summarize_finished(result)
+        
+        if not self._start_job(
+            summarize_operation,
+            on_finished,
+            self.on_operation_error,
+            kind="summarize"
+        ):
+            self.show_status("Конспект уже создается...")
+            return
+        
+        self.show_progress("Создание конспекта...", self.summary_progress)
     
     def on_summarize_finished(self, result: Dict):
         """Обработчик завершения конспектирования"""
@@ -794,31 +1424,40 @@ class MainWindow(QMainWindow):
             summary_data = result.get('summary', {})
             summary_text = summary_data.get('summary_text', 'Конспект не найден')
             
-            # Форматируем и отображаем конспект
-            summary_text_html = summary_text.replace("\n", "<br>")
-
-            formatted_summary = f"""
-                <h3>📝 Конспект документа</h3>
-                <p><b>Тип:</b> {summary_data.get('summary_type', 'general')}</p>
-                <p><b>Модель:</b> {summary_data.get('model_used', 'unknown')}</p>
-                <p><b>Время генерации:</b> {summary_data.get('generation_time', 0):.2f} сек</p>
-                <hr>
-                <div style="line-height: 1.6; font-size: 14px;">
-                {summary_text_html}
-                </div> """
-
-            self.summary_display.setHtml(formatted_summary)
+            # Собираем конспект курсором с готовыми форматами, без разбора HTML
+            self.summary_display.clear()
+            cursor = self.summary_display.textCursor()
+            cursor.insertText("📝 Конспект документа\n", self._fmt_title)
+            for label, value in (
+                ("Тип", summary_data.get('summary_type', 'general')),
+                ("Модель", summary_data.get('model_used', 'unknown')),
+                ("Время генерации", f"{summary_data.get('generation_time') or 0:.2f} сек"),
+            ):
+                cursor.insertText(f"{label}: ", self._fmt_label)
+                cursor.insertText(f"{value}\n", self._fmt_body)
+            
+            cursor.insertText("─" * 40, self._fmt_body)
+            cursor.insertBlock(self._block_body, self._fmt_body)
+            cursor.insertText(summary_text, self._fmt_body)
+            
+            self.summary_display.moveCursor(QTextCursor.MoveOperation.Start)
             self.show_success("Конспект создан успешно!")
     
     def ask_question(self):
         """Задать вопрос по документам"""
+        # Enter и кнопка могут сработать дважды подряд - второй вызов игнорируем
+        now = time.monotonic()
+        if now - self._qa_last_ts < 0.4:
+            return
+        self._qa_last_ts = now
+        
         question = self.question_input.text().strip()
         if not question:
             self.show_error("Введите вопрос")
             return
         
         # Получаем ID обработанных документов
-        completed_docs = [d['id'] for d in self.current_documents if d.get('processing_status') == 'completed']
+        completed_docs = self._completed_doc_ids
         
         if not completed_docs:
             self.show_error("Нет обработанных документов для поиска ответа")
@@ -826,17 +1465,48 @@ class MainWindow(QMainWindow):
         
         self.ask_question_async(completed_docs, question)
     
-    def ask_question_async(self, document_ids: List[int], question: str):
+    def ask_question_async(self, document_ids: Sequence[int], question: str):
         """Асинхронный поиск ответа"""
+        # Одновременно ищется ответ только на один вопрос
+        if self._qa_in_flight:
+            self.show_status("Ответ еще ищется...")
+            return
+        
+        # На этот же вопрос по тем же документам уже отвечали
+        cache_key = (tuple(sorted(document_ids)), question.strip().lower())
+        cached = self._qa_cache.get(cache_key)
+        if cached is not None:
+            self._qa_cache.move_to_end(cache_key)
+            QTimer.singleShot(0, lambda: self.on_question_answered(cached, question))
+            return
+        
         self.show_progress("Поиск ответа...", self.qa_progress)
+        self._set_qa_in_flight(True)
+        self._qa_gen += 1
+        gen = self._qa_gen
         
         def question_operation():
             return self.api_client.ask_question(document_ids, question)
         
-        self.worker = WorkerThread(question_operation)
-        self.worker.finished.connect(lambda result: self.on_question_answered(result, question))
-        self.worker.error.connect(self.on_operation_error)
-        self.worker.start()
+        def on_finished(result: Dict):
+            self._set_qa_in_flight(False)
+            if "error" not in result:
+                self._qa_cache[cache_key] = result
+                if len(self._qa_cache) > self._qa_cache_size:
+                    self._qa_cache.popitem(last=False)
+            if gen == self._qa_gen:
+                self.on_question_answered(result, question)
+        
+        def on_error(error: Exception):
+            self._set_qa_in_flight(False)
+            self.on_operation_error(error)
+        
+        self._start_job(question_operation, on_finished, on_error)
+    
+    def _set_qa_in_flight(self, in_flight: bool):
+        """Отметка выполняющегося запроса ответа и блокировка кнопки"""
+        self._qa_in_flight = in_flight
+        self.ask_btn.setEnabled(not in_flight)
     
     def on_question_answered(self, result: Dict, question: str):
         """Обработчик получения ответа"""
@@ -859,8 +1529,12 @@ class MainWindow(QMainWindow):
             </div>
             """
             
-            current_html = self.qa_history.toHtml()
-            self.qa_history.setHtml(current_html + qa_entry)
+            # Дописываем только новую запись, не разбирая заново всю историю
+            cursor = self.qa_history.textCursor()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertHtml(qa_entry)
+            self.qa_history.setTextCursor(cursor)
+            self.qa_history.ensureCursorVisible()
             
             # Очищаем поле ввода
             self.question_input.clear()
@@ -876,32 +1550,65 @@ class MainWindow(QMainWindow):
     
     def start_screen_capture(self):
         """Запуск виджета захвата экрана"""
-        self.capture_widget = ScreenCaptureWidget()
-        self.capture_widget.captured.connect(self.on_screen_captured)
-        self.capture_widget.show()
+        # Виджет создается при первом захвате и дальше переиспользуется
+        if self.capture_widget is None:
+            self.capture_widget = ScreenCaptureWidget()
+            self.capture_widget.captured.connect(self.on_screen_captured)
+        
+        # Захватываем тот экран, на котором находится курсор
+        from PyQt6.QtGui import QCursor
+        screen = QApplication.screenAt(QCursor.pos()) or self._primary_screen
+        self.capture_widget.show_on_screen(screen)
     
     def on_screen_captured(self, rect: QRect):
         """Обработчик захвата области экрана"""
         self.show()  # показываем главное окно обратно
         
         try:
-            # Захватываем выделенную область
-            screen = QApplication.primaryScreen()
-            pixmap = screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height())
+            # Вырезаем область из уже снятого скриншота, а не снимаем экран повторно:
+            # к этому моменту главное окно снова показано и могло бы попасть в снимок
+            # Сразу переходим к QImage и дальше работаем только с ним, не держа
+            # одновременно копию области в QPixmap
+            if self.capture_widget.screenshot is not None:
+                image = self.capture_widget.selection_pixmap(rect).toImage()
+            else:
+                screen = self.capture_widget.capture_screen or self._primary_screen
+                image = screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height()).toImage()
             
-            # Конвертируем в base64
-            byte_array = bytearray()
-            buffer = QBuffer(byte_array)
-            buffer.open(QBuffer.OpenModeFlag.WriteOnly)
-            pixmap.save(buffer, "PNG")
-            image_base64 = base64.b64encode(byte_array).decode('utf-8')
+            # Большие области с HiDPI экрана уменьшаем до логического разрешения:
+            # текст там и так крупный, а кодировать и передавать вдвое-вчетверо меньше.
+            # Маленькие области оставляем как есть - мелкий текст распознается хуже
+            dpr = image.devicePixelRatio()
+            if dpr > 1 and image.width() * image.height() > self.OCR_DOWNSCALE_MIN_PIXELS:
+                image = image.scaled(
+                    round(image.width() / dpr),
+                    round(image.height() / dpr),
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation
+                )
+            
+            # Сервер все равно распознает в градациях серого: 8 бит на пиксель вместо 32
+            # заметно уменьшают PNG и объем передаваемых данных
+            image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+            
+            # Кодируем в PNG (без потерь - так точнее распознавание) в общий буфер,
+            # очищая его без освобождения памяти.
+            # Для PNG Qt переводит quality в уровень zlib: 80 соответствует уровню 1,
+            # он заметно быстрее уровня по умолчанию при почти том же размере
+            self._png_buf.resize(0)
+            self._png_dev.seek(0)
+            image.save(self._png_dev, "PNG", 80)
+            image_bytes = bytes(self._png_buf)
             
             # Отправляем на OCR
-            self.process_ocr_async(image_base64)
+            self.process_ocr_async(image_bytes)
             
         except Exception as e:
             self.show_error(f"Ошибка захвата экрана: {e}")
     
+    def _on_primary_screen_changed(self, screen):
+        self._primary_screen = screen
+    
     def capture_and_question(self):
         """Захват области и сразу задать вопрос"""
         # Сначала захватываем область
@@ -909,18 +1616,96 @@ class MainWindow(QMainWindow):
         # После OCR автоматически зададим вопрос
         self._auto_question_after_ocr = True
     
-    def process_ocr_async(self, image_data: str):
+    def process_ocr_async(self, image_data: bytes):
         """Асинхронная обработка OCR"""
         self.show_progress("Распознавание текста...", self.ocr_progress)
         self.tab_widget.setCurrentIndex(2)  # переключаемся на вкладку OCR
         
+        # Результат предыдущего, еще не завершенного распознавания станет неактуальным
+        self._ocr_gen += 1
+        gen = self._ocr_gen
+        
+        # Ту же область уже распознавали - повторно на сервер не отправляем
+        image_key = hashlib.blake2b(image_data, digest_size=8).hexdigest()
+        cached = self._ocr_cache.get(image_key)
+        if cached is not None:
+            QTimer.singleShot(0, lambda: self.on_ocr_finished(cached))
+            return
+        
+        # Вопрос по захваченной области - распознавание и ответ одним запросом
+        if (
+            self._auto_question_after_ocr
+            and self._completed_doc_ids
+            and not self._qa_in_flight
+        ):
+            self._ocr_and_answer_async(image_data, image_key, gen)
+            return
+        
         def ocr_operation():
-            return self.api_client.ocr_image(image_data)
+            return self.api_client.ocr_image_bytes(image_data)
+        
+        def on_finished(result: Dict):
+            if "error" not in result:
+                self._remember_ocr_result(image_key, result)
+            if gen == self._ocr_gen:
+                self.on_ocr_finished(result)
+        
+        self._start_job(ocr_operation, on_finished, self.on_operation_error)
+    
+    def _remember_ocr_result(self, image_key: str, result: Dict):
+        """Сохранение результата OCR в кэше сеанса"""
+        # Ограничиваем кэш, вытесняя самый старый результат
+        if len(self._ocr_cache) >= 32:
+            del self._ocr_cache[next(iter(self._ocr_cache))]
+        self._ocr_cache[image_key] = result
+    
+    def _ocr_and_answer_async(self, image_data: bytes, image_key: str, gen: int):
+        """Асинхронные OCR и поиск ответа на распознанный текст за один запрос"""
+        document_ids = self._completed_doc_ids
+        self._set_qa_in_flight(True)
+        self._qa_gen += 1
+        qa_gen = self._qa_gen
+        
+        def ocr_and_answer_operation():
+            return self.api_client.ocr_and_answer(image_data, document_ids)
+        
+        def on_finished(result: Dict):
+            self._set_qa_in_flight(False)
+            
+            if "error" not in result:
+                self._remember_ocr_result(image_key, result.get('ocr', {}))
+            
+            # Пока шел запрос, был сделан новый захват - этот результат уже не нужен
+            if gen != self._ocr_gen:
+                return
+            
+            # Вопрос уже задан сервером - on_ocr_finished не должен задавать его снова
+            self._auto_question_after_ocr = False
+            
+            if "error" in result:
+                self.on_ocr_finished(result)
+                return
+            
+            ocr_result = result.get('ocr', {})
+            self.on_ocr_finished(ocr_result)
+            
+            if qa_gen != self._qa_gen:
+                return
+            
+            # Текст распознан, но ответ не получен - сообщаем об этом отдельно от OCR
+            question = ocr_result.get('extracted_text', '').strip()
+            answer = result.get('answer')
+            if answer is not None:
+                self.tab_widget.setCurrentIndex(1)  # переключаемся на вкладку Q&A
+                self.on_question_answered(answer, question)
+            elif question and result.get('answer_error'):
+                self.show_error(f"Ошибка поиска ответа: {result['answer_error']}")
         
-        self.worker = WorkerThread(ocr_operation)
-        self.worker.finished.connect(self.on_ocr_finished)
-        self.worker.error.connect(self.on_operation_error)
-        self.worker.start()
+        def on_error(error: Exception):
+            self._set_qa_in_flight(False)
+            self.on_operation_error(error)
+        
+        self._start_job(ocr_and_answer_operation, on_finished, on_error)
     
     def on_ocr_finished(self, result: Dict):
         """Обработчик завершения OCR"""
@@ -934,51 +1719,37 @@ class MainWindow(QMainWindow):
             
             if extracted_text.strip():
                 # Отображаем распознанный текст
-                extracted_text_html = extracted_text.replace("\n", "<br>")
-
-                ocr_display = f"""
-                    <h4>👁️ Распознанный текст</h4>
-                    <p><b>Уверенность:</b> {confidence:.2f}</p>
-                    <p><b>Время обработки:</b> {result.get('processing_time', 0):.2f}с</p>
-                    <hr>
-                    <div style="font-family: monospace; background-color: #f5f5f5; padding: 10px; border-radius: 4px;">
-                    {extracted_text_html}
-                    </div>
-                    """
-
-                
-                self.ocr_result.setHtml(ocr_display)
+                self.ocr_info.setText(
+                    f"Уверенность: {confidence or 0:.2f} | "
+                    f"Время обработки: {result.get('processing_time', 0):.2f}с"
+                )
+                self.ocr_info.setVisible(True)
+                self.ocr_result.setPlainText(extracted_text)
                 self.ocr_question_btn.setEnabled(True)
                 
                 # Если это автоматический вопрос после захвата
-                if hasattr(self, '_auto_question_after_ocr') and self._auto_question_after_ocr:
+                if self._auto_question_after_ocr:
                     self._auto_question_after_ocr = False
                     self.ask_question_from_ocr()
                 
                 self.show_success("Текст распознан успешно!")
             else:
+                self.ocr_info.setVisible(False)
                 self.ocr_result.setPlainText("Текст не распознан или область не содержит текста.")
                 self.ocr_question_btn.setEnabled(False)
                 self.show_error("Не удалось распознать текст")
     
     def ask_question_from_ocr(self):
         """Задать вопрос на основе OCR текста"""
-        ocr_text = self.ocr_result.toPlainText()
-        
-        # Извлекаем только распознанный текст (убираем HTML разметку)
-        import re
-        text_match = re.search(r'<div[^>]*>(.*?)</div>', ocr_text, re.DOTALL)
-        if text_match:
-            clean_text = text_match.group(1).replace('<br>', ' ').strip()
-        else:
-            clean_text = ocr_text.strip()
+        # Берем текст из поля, чтобы учесть исправления пользователя
+        clean_text = self.ocr_result.toPlainText().strip()
         
         if not clean_text:
             self.show_error("Нет распознанного текста для поиска ответа")
             return
         
         # Получаем ID обработанных документов
-        completed_docs = [d['id'] for d in self.current_documents if d.get('processing_status') == 'completed']
+        completed_docs = self._completed_doc_ids
         
         if not completed_docs:
             self.show_error("Нет обработанных документов для поиска ответа")
@@ -994,35 +1765,68 @@ class MainWindow(QMainWindow):
         """Показать прогресс операции"""
         progress_bar.setVisible(True)
         progress_bar.setRange(0, 0)  # индикатор неопределенного прогресса
-        self.statusBar().showMessage(message)
+        self._statusbar.showMessage(message)
     
     def hide_progress(self, progress_bar: QProgressBar):
         """Скрыть прогресс операции"""
         progress_bar.setVisible(False)
-        self.statusBar().clearMessage()
+        self._statusbar.clearMessage()
     
     def show_status(self, message: str):
         """Показать статусное сообщение"""
-        self.statusBar().showMessage(message, 3000)
+        self._statusbar.showMessage(message, 3000)
     
     def show_success(self, message: str):
         """Показать сообщение об успехе"""
-        self.statusBar().showMessage(f"✅ {message}", 5000)
+        self._statusbar.showMessage(f"✅ {message}", 5000)
     
     def show_error(self, message: str):
         """Показать сообщение об ошибке"""
-        self.statusBar().showMessage(f"❌ {message}", 10000)
+        self._statusbar.showMessage(f"❌ {message}", 10000)
         
-        # Также показываем в диалоге для важных ошибок
-        if "ошибка" in message.lower() or "error" in message.lower():
+        # Также показываем в диалоге для важных ошибок, но не чаще раза в 2 секунды:
+        # при серии сбоев остальные сообщения видны только в статусной строке
+        lowered = message.lower()
+        if ("ошибка" in lowered or "error" in lowered) and \
+                time.monotonic() - self._error_dialog_cooldown > 2.0:
             QMessageBox.warning(self, "Ошибка", message)
+            # Отсчет от закрытия диалога: пока он открыт, новые не накапливаются
+            self._error_dialog_cooldown = time.monotonic()
     
-    def on_operation_error(self, error_message: str):
+    def on_operation_error(self, error: Exception):
         """Обработчик ошибок операций"""
+        self.upload_progress.setVisible(False)
         self.hide_progress(self.summary_progress)
         self.hide_progress(self.qa_progress)
         self.hide_progress(self.ocr_progress)
-        self.show_error(f"Ошибка операции: {error_message}")
+        
+        # Текст ошибки нужен только для показа пользователю
+        if self.isVisible():
+            self.show_error(f"Ошибка операции: {type(error).__name__}: {error}")
+    
+    def shutdown(self):
+        """Завершение работы: фоновые задачи, соединения с сервером и кэш"""
+        self.status_timer.stop()
+        
+        # Задачи, еще стоящие в очереди, не запускаем; выполняющиеся ждем недолго,
+        # чтобы не закрыть соединения у них из-под ног
+        self.thread_pool.clear()
+        self.thread_pool.waitForDone(2000)
+        
+        self.api_client.close()
+        self.summary_cache.close()
+        self._png_dev.close()
+    
+    def showEvent(self, event):
+        """Окно показано (запуск или восстановление из трея) - обновляем список и возобновляем опрос"""
+        super().showEvent(event)
+        self.refresh_documents()
+        self.status_timer.start()
+    
+    def hideEvent(self, event):
+        """Окно скрыто - сервер не опрашиваем, пока его не покажут снова"""
+        self.status_timer.stop()
+        super().hideEvent(event)
     
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
@@ -1050,6 +1854,9 @@ class SettingsDialog(QDialog):
         self.setup_ui()
     
     def setup_ui(self):
+        # Нужен только в диалоге настроек
+        from PyQt6.QtWidgets import QSpinBox
+        
         layout = QVBoxLayout(self)
         
         # API настройки
@@ -1093,20 +1900,31 @@ class SettingsDialog(QDialog):
         layout.addLayout(buttons_layout)
 
 
-def check_server_connection():
-    """Проверка подключения к серверу"""
-    client = APIClient()
-    return client.check_health()
+def check_server_connection(client: APIClient, timeout: float = 1.0) -> bool:
+    """Проверка подключения к серверу (короткий таймаут, чтобы не подвешивать запуск)"""
+    return client.check_health(timeout=timeout)
 
 
 def main():
     """Главная функция приложения"""
+    # Проверяем сервер в фоне, пока инициализируется Qt. Клиент затем передается
+    # главному окну, и первый запрос идет по уже открытому соединению
+    api_client = APIClient()
+    health_executor = ThreadPoolExecutor(max_workers=1)
+    server_check = health_executor.submit(check_server_connection, api_client)
+    health_executor.shutdown(wait=False)
+    
     app = QApplication(sys.argv)
     app.setApplicationName("Document AI Assistant")
     app.setApplicationVersion("0.1.0")
     
     # Проверяем подключение к серверу
-    if not check_server_connection():
+    try:
+        server_available = server_check.result(timeout=1.5)
+    except Exception:
+        server_available = False
+    
+    if not server_available:
         msg = QMessageBox()
         msg.setIcon(QMessageBox.Icon.Warning)
         msg.setWindowTitle("Ошибка подключения")
@@ -1119,17 +1937,20 @@ def main():
         msg.setStandardButtons(QMessageBox.StandardButton.Retry | QMessageBox.StandardButton.Close)
         
         if msg.exec() == QMessageBox.StandardButton.Retry:
-            if not check_server_connection():
+            if not check_server_connection(api_client):
                 sys.exit(1)
         else:
             sys.exit(1)
     
     # Создаем и показываем главное окно
-    window = MainWindow()
+    window = MainWindow(api_client)
     window.show()
     
-    # Показываем приветственное сообщение
-    welcome_msg = QMessageBox()
+    # Останавливаем фоновые задачи и закрываем соединения при выходе из приложения
+    app.aboutToQuit.connect(window.shutdown)
+    
+    # Показываем приветственное сообщение немодально, уже после первой отрисовки окна
+    welcome_msg = QMessageBox(window)
     welcome_msg.setIcon(QMessageBox.Icon.Information)
     welcome_msg.setWindowTitle("Добро пожаловать!")
     welcome_msg.setText("Document AI Assistant готов к работе!")
@@ -1139,7 +1960,8 @@ def main():
         "• Ctrl+Shift+Q - Выделить область и найти ответ\n\n"
         "Загрузите документы и начните работу!"
     )
-    welcome_msg.exec()
+    welcome_msg.setModal(False)
+    QTimer.singleShot(50, welcome_msg.show)
     
     return app.exec()
 